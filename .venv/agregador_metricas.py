@@ -0,0 +1,214 @@
+"""
+Agregador incremental de métricas del simulador.
+
+Cada muestra actualiza en O(1):
+- totales del día (los campos del reporte diario),
+- ventanas rodantes de 1 min / 1 h / 1 día con mín/máx/media por serie,
+- histogramas de niveles y caudal para percentiles,
+- ciclo de trabajo de la bomba (la serie 'bomba' vale 1 encendida, 0 apagada).
+
+Cada muestra puede pesar varios pasos de física ('pasos'): el avance rápido
+resume tramos lineales en una muestra cada tanto sin sesgar medias ni percentiles.
+
+Los reportes y CSV leen los resúmenes ya calculados (rollup_dia, resumen_ventana).
+"""
+import math
+
+SERIES = ("nivel_cis_cm", "nivel_sup_cm", "caudal_bomba_lps", "bomba")
+VENTANAS = {"1min": 60, "1h": 3600, "1d": 86400}
+
+# Columnas de los CSV (mismo orden que el reporte diario)
+CAMPOS_CSV = [
+    "seg_bomba_encendida", "eventos_encendido_bomba", "alertas", "protecciones_en_seco",
+    "litros_bombeados", "litros_entrada", "litros_consumidos",
+    "seg_pid_activo", "seg_pid_auto_llenado",
+    "min_cis_cm", "max_cis_cm", "min_sup_cm", "max_sup_cm",
+]
+_CAMPOS_SEGUNDOS_LITROS = {
+    "seg_bomba_encendida", "litros_bombeados", "litros_entrada", "litros_consumidos",
+    "seg_pid_activo", "seg_pid_auto_llenado",
+}
+
+
+class VentanaRodante:
+    """
+    Ventana de 'duracion' segundos partida en 'cubetas' intervalos. Cada cubeta
+    guarda cuenta/suma/mín/máx por serie; al avanzar el tiempo se reciclan las
+    cubetas vencidas. Actualizar es O(1) amortizado; consultar es O(cubetas).
+    """
+    def __init__(self, duracion: float, n_series: int, cubetas: int = 60):
+        self.ancho = duracion / cubetas
+        self.cubetas = cubetas
+        self.n_series = n_series
+        self._id = [None] * cubetas          # número absoluto de cubeta en cada ranura
+        self._cuenta = [0] * cubetas
+        self._suma = [[0.0] * n_series for _ in range(cubetas)]
+        self._min = [[math.inf] * n_series for _ in range(cubetas)]
+        self._max = [[-math.inf] * n_series for _ in range(cubetas)]
+        self._ultimo = None
+
+    def agregar(self, t: float, valores, peso: int = 1) -> None:
+        n = int(t // self.ancho)
+        i = n % self.cubetas
+        if self._id[i] != n:
+            self._id[i] = n
+            self._cuenta[i] = 0
+            s, mn, mx = self._suma[i], self._min[i], self._max[i]
+            for k in range(self.n_series):
+                s[k] = 0.0; mn[k] = math.inf; mx[k] = -math.inf
+        self._ultimo = n
+        self._cuenta[i] += peso
+        s, mn, mx = self._suma[i], self._min[i], self._max[i]
+        for k, v in enumerate(valores):
+            s[k] += v * peso
+            if v < mn[k]: mn[k] = v
+            if v > mx[k]: mx[k] = v
+
+    def resumen(self, t: float = None):
+        """Lista por serie de (mín, máx, media, muestras); None si no hay datos."""
+        if self._ultimo is None:
+            return [None] * self.n_series
+        n_actual = self._ultimo if t is None else int(t // self.ancho)
+        cuenta = 0
+        suma = [0.0] * self.n_series
+        mn = [math.inf] * self.n_series
+        mx = [-math.inf] * self.n_series
+        for i in range(self.cubetas):
+            nid = self._id[i]
+            if nid is None or not (n_actual - self.cubetas < nid <= n_actual):
+                continue
+            cuenta += self._cuenta[i]
+            for k in range(self.n_series):
+                suma[k] += self._suma[i][k]
+                if self._min[i][k] < mn[k]: mn[k] = self._min[i][k]
+                if self._max[i][k] > mx[k]: mx[k] = self._max[i][k]
+        if cuenta == 0:
+            return [None] * self.n_series
+        return [(mn[k], mx[k], suma[k] / cuenta, cuenta) for k in range(self.n_series)]
+
+
+class Histograma:
+    """Boceto de percentiles con cubetas fijas en [lo, hi]; error ≤ (hi-lo)/bins."""
+    def __init__(self, lo: float, hi: float, bins: int = 400):
+        self.lo, self.hi, self.bins = lo, hi, bins
+        self._escala = bins / (hi - lo)
+        self.cuentas = [0] * bins
+        self.n = 0
+
+    def agregar(self, v: float, peso: int = 1) -> None:
+        i = int((v - self.lo) * self._escala)
+        if i < 0: i = 0
+        elif i >= self.bins: i = self.bins - 1
+        self.cuentas[i] += peso
+        self.n += peso
+
+    def percentil(self, q: float):
+        if self.n == 0:
+            return None
+        objetivo = q / 100 * self.n
+        acum = 0
+        for i, c in enumerate(self.cuentas):
+            acum += c
+            if acum >= objetivo and c:
+                return self.lo + (i + 0.5) / self._escala
+        return self.hi
+
+
+class AgregadorMetricas:
+    def __init__(self, alto_cisterna_cm: float = 200, alto_tanque_sup_cm: float = 200,
+                 caudal_max_lps: float = 1.5):
+        self._ventanas = {k: VentanaRodante(d, len(SERIES)) for k, d in VENTANAS.items()}
+        self._limites = (alto_cisterna_cm, alto_tanque_sup_cm, caudal_max_lps)
+        # detectores de flanco: sobreviven al cambio de día (una bomba que ya
+        # estaba encendida a medianoche no es un arranque nuevo)
+        self._prev_bomba = False
+        self._prev_alerta = False
+        self.reiniciar_dia()
+
+    def reiniciar_dia(self) -> None:
+        """Reinicia totales e histogramas del día; las ventanas rodantes siguen."""
+        alto_cis, alto_sup, q_max = self._limites
+        self.totales = {c: 0 for c in CAMPOS_CSV if not c.startswith(("min_", "max_"))}
+        self._min_cis = self._max_cis = self._min_sup = self._max_sup = None
+        self._hist = {
+            "nivel_cis_cm": Histograma(0, alto_cis),
+            "nivel_sup_cm": Histograma(0, alto_sup),
+            "caudal_bomba_lps": Histograma(0, q_max),
+        }
+
+    def muestra(self, t: float, dt_fisica: float, dt_real: float,
+                nivel_cis: float, nivel_sup: float, caudal_bomba: float,
+                caudal_entrada: float, consumo: float, bomba_on: bool,
+                pid_activo: bool, auto_llenado: bool, alerta_activa: bool, disparo_seco: bool,
+                pasos: int = 1) -> None:
+        tot = self.totales
+        if self._min_cis is None or nivel_cis < self._min_cis: self._min_cis = nivel_cis
+        if self._max_cis is None or nivel_cis > self._max_cis: self._max_cis = nivel_cis
+        if self._min_sup is None or nivel_sup < self._min_sup: self._min_sup = nivel_sup
+        if self._max_sup is None or nivel_sup > self._max_sup: self._max_sup = nivel_sup
+
+        if bomba_on and not self._prev_bomba:
+            tot["eventos_encendido_bomba"] += 1
+        self._prev_bomba = bomba_on
+        if alerta_activa and not self._prev_alerta:
+            tot["alertas"] += 1
+        self._prev_alerta = alerta_activa
+        if disparo_seco:
+            tot["protecciones_en_seco"] += 1
+
+        if dt_real > 0:
+            if bomba_on:
+                tot["seg_bomba_encendida"] += dt_real
+            if pid_activo:
+                tot["seg_pid_activo"] += dt_real
+                if auto_llenado:
+                    tot["seg_pid_auto_llenado"] += dt_real
+        if dt_fisica > 0:
+            tot["litros_bombeados"]  += max(caudal_bomba, 0) * dt_fisica
+            tot["litros_entrada"]    += max(caudal_entrada, 0) * dt_fisica
+            tot["litros_consumidos"] += max(consumo, 0) * dt_fisica
+
+        valores = (nivel_cis, nivel_sup, caudal_bomba, 1.0 if bomba_on else 0.0)
+        for v in self._ventanas.values():
+            v.agregar(t, valores, pasos)
+        h = self._hist
+        h["nivel_cis_cm"].agregar(nivel_cis, pasos)
+        h["nivel_sup_cm"].agregar(nivel_sup, pasos)
+        h["caudal_bomba_lps"].agregar(caudal_bomba, pasos)
+
+    # ---- Consultas (pre-calculadas / O(cubetas)) ----
+    def rollup_dia(self) -> dict:
+        """Totales del día con las mismas claves que usaba el dict 'metricas'."""
+        r = dict(self.totales)
+        for clave, v in (("min_cis_cm", self._min_cis), ("max_cis_cm", self._max_cis),
+                         ("min_sup_cm", self._min_sup), ("max_sup_cm", self._max_sup)):
+            r[clave] = None if v is None else round(v, 2)
+        return r
+
+    def percentiles(self, serie: str, qs=(5, 50, 95)) -> dict:
+        h = self._hist[serie]
+        return {q: h.percentil(q) for q in qs}
+
+    def resumen_ventana(self, ventana: str, t: float = None) -> dict:
+        """{serie: {'min','max','media','n'}} para '1min', '1h' o '1d'."""
+        res = {}
+        for serie, r in zip(SERIES, self._ventanas[ventana].resumen(t)):
+            res[serie] = None if r is None else {"min": r[0], "max": r[1], "media": r[2], "n": r[3]}
+        return res
+
+    def ciclo_trabajo(self, ventana: str, t: float = None):
+        """Fracción de muestras con la bomba encendida en la ventana (0–1)."""
+        r = self.resumen_ventana(ventana, t)["bomba"]
+        return None if r is None else r["media"]
+
+
+def fila_csv(rollup: dict) -> dict:
+    """Formatea un rollup_dia() para csv.DictWriter con columnas CAMPOS_CSV."""
+    fila = {}
+    for c in CAMPOS_CSV:
+        v = rollup[c]
+        if c in _CAMPOS_SEGUNDOS_LITROS:
+            fila[c] = f"{v:.3f}"
+        else:
+            fila[c] = "" if v is None else v
+    return fila
@@ -0,0 +1,289 @@
+"""
+Autoajuste offline de ganancias PID para el tanque superior.
+
+Cada prueba es un lazo cerrado sin render: mismo PID (pid_controller) y mismas
+ecuaciones de planta que simulacion.py, vía motor_lote. Las pruebas se
+reparten en lotes entre todos los núcleos con un pool de procesos.
+
+Uso:
+    python autoajuste_pid.py                          # grid + descenso por coordenadas
+    python autoajuste_pid.py --kp 0.02:0.4:10 --ki 0:0.05:6 --kd 0:0.2:6
+    python autoajuste_pid.py --instalaciones edificios.csv --csv resultados.csv
+"""
+import argparse, csv, itertools, os, time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, asdict, fields
+import numpy as np
+
+from pid_controller import PIDGains
+from motor_lote import crear_escenarios, MotorLote
+
+UMBRAL_BOMBEANDO = 0.01   # velocidad mínima para contar la bomba como "en marcha"
+
+
+@dataclass
+class Prueba:
+    """Condiciones de la prueba en lazo cerrado (una instalación)."""
+    nombre: str = "defecto"
+    setpoint_cm: float = 120
+    nivel_inicial_sup_cm: float = 115   # escalón chico: desde 90 cm la bomba satura (límite de
+                                        # presión) y todas las ganancias suben igual
+    nivel_inicial_cis_cm: float = 140
+    area_cisterna_cm2: float = 25000
+    area_tanque_sup_cm2: float = 25000
+    caudal_bomba_max_lps: float = 1.5
+    caudal_entrada_lps: float = 0.8
+    consumo_lps: float = 0.3
+    perturbacion: float = 1.5      # factor de consumo en la segunda mitad
+    duracion_s: float = 7200
+    dt: float = 0.5
+    banda_cm: float = 2.0          # banda de asentamiento
+
+
+@dataclass
+class Resultado:
+    kp: float
+    ki: float
+    kd: float
+    ise: float
+    iae: float
+    sobrepico_cm: float
+    t_asentamiento_s: float        # inf si al llegar la perturbación sigue fuera de banda
+    ciclos: int
+    costo: float = 0.0
+
+
+@dataclass
+class Pesos:
+    iae: float = 1.0
+    sobrepico: float = 0.5
+    asentamiento: float = 1 / 600
+    ciclos: float = 0.2
+
+    def costo(self, r: Resultado, duracion_s: float) -> float:
+        # sin asentar cuenta como la prueba entera: peor que asentar en la última muestra
+        return (self.iae * r.iae / duracion_s
+                + self.sobrepico * r.sobrepico_cm
+                + self.asentamiento * min(r.t_asentamiento_s, duracion_s)
+                + self.ciclos * r.ciclos)
+
+
+def evaluar_lote(args):
+    """Corre en un proceso hijo: simula todas las ganancias del lote a la vez."""
+    prueba, ganancias = args
+    g = np.asarray(ganancias, dtype=np.float64).reshape(-1, 3)
+    n = len(g)
+    esc = crear_escenarios(
+        n,
+        area_cisterna_cm2=prueba.area_cisterna_cm2,
+        area_tanque_sup_cm2=prueba.area_tanque_sup_cm2,
+        caudal_bomba_max_lps=prueba.caudal_bomba_max_lps,
+        caudal_entrada_lps=prueba.caudal_entrada_lps,
+        consumo_tanque_sup_lps=prueba.consumo_lps,
+        nivel_cisterna_cm=prueba.nivel_inicial_cis_cm,
+        nivel_tanque_sup_cm=prueba.nivel_inicial_sup_cm,
+        entrada_on=True,
+        pid_enabled=True,
+        pid_target_cm=prueba.setpoint_cm,
+        kp=g[:, 0], ki=g[:, 1], kd=g[:, 2],
+    )
+    motor = MotorLote(esc)
+    dt = prueba.dt
+    sp = prueba.setpoint_cm
+    pasos = int(round(prueba.duracion_s / dt))
+    mitad = pasos // 2
+
+    ise = np.zeros(n); iae = np.zeros(n); sobre = np.zeros(n)
+    ultimo_fuera = np.zeros(n)
+    ciclos = np.zeros(n, dtype=np.int64)
+    bombeando_prev = np.zeros(n, dtype=bool)
+
+    for k in range(pasos):
+        if k == mitad:
+            esc.consumo_tanque_sup_lps *= prueba.perturbacion
+        motor.paso(dt)
+        e = sp - motor.nivel_sup
+        ise += e * e * dt
+        iae += np.abs(e) * dt
+        np.maximum(sobre, -e, out=sobre)
+        if k < mitad:
+            ultimo_fuera[np.abs(e) > prueba.banda_cm] = motor.t
+        if k == mitad - 1:
+            ultimo_fuera[np.abs(e) > prueba.banda_cm] = np.inf
+        bombeando = motor.bomba_on & (motor.velocidad > UMBRAL_BOMBEANDO)
+        ciclos += bombeando & ~bombeando_prev
+        bombeando_prev = bombeando
+
+    return [Resultado(float(g[i, 0]), float(g[i, 1]), float(g[i, 2]),
+                      float(ise[i]), float(iae[i]), float(max(sobre[i], 0)),
+                      float(ultimo_fuera[i]), int(ciclos[i]))
+            for i in range(n)]
+
+
+class Evaluador:
+    """Reparte listas de ganancias en lotes sobre un pool de procesos."""
+
+    def __init__(self, prueba: Prueba, pesos: Pesos, procesos=None):
+        self.prueba = prueba
+        self.pesos = pesos
+        self.procesos = procesos or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(max_workers=self.procesos)
+        self.memo = {}
+
+    def cerrar(self):
+        self.pool.shutdown()
+
+    def evaluar(self, ganancias):
+        nuevas = [tuple(round(max(0.0, x), 6) for x in g) for g in ganancias]
+        faltan = list(dict.fromkeys(g for g in nuevas if g not in self.memo))
+        if faltan:
+            n_lotes = min(len(faltan), self.procesos * 2)
+            lotes = [faltan[i::n_lotes] for i in range(n_lotes)]
+            for res in self.pool.map(evaluar_lote, [(self.prueba, l) for l in lotes]):
+                for r in res:
+                    r.costo = self.pesos.costo(r, self.prueba.duracion_s)
+                    self.memo[(r.kp, r.ki, r.kd)] = r
+        return [self.memo[g] for g in nuevas]
+
+
+def rango(texto):
+    """'a:b:n' -> n valores entre a y b; 'x' -> [x]."""
+    partes = [float(p) for p in texto.split(":")]
+    if len(partes) == 1:
+        return partes
+    a, b, n = partes
+    return list(np.linspace(a, b, int(n)))
+
+
+def busqueda_grid(ev: Evaluador, kps, kis, kds):
+    return ev.evaluar(list(itertools.product(kps, kis, kds)))
+
+
+def descenso_coordenadas(ev: Evaluador, inicio, escala, paso_rel=0.25, paso_min=0.01, max_iter=30):
+    """
+    Descenso por coordenadas con paso adaptativo. En cada iteración se evalúan
+    en paralelo los 6 vecinos (±paso·escala en kp, ki, kd, sin bajar de 0); si
+    ninguno mejora, el paso se reduce a la mitad. 'escala' es el ancho del rango
+    de cada ganancia (el del grid), así un óptimo en ki=0 o kd=0 también se explora.
+    """
+    mejor = ev.evaluar([inicio])[0]
+    escala = np.asarray(escala, dtype=float)
+    paso = paso_rel
+    for _ in range(max_iter):
+        if paso < paso_min:
+            break
+        base = np.array([mejor.kp, mejor.ki, mejor.kd])
+        vecinos = []
+        for j in range(3):
+            for s in (+1, -1):
+                v = base.copy()
+                v[j] = max(0.0, v[j] + s * paso * escala[j])
+                vecinos.append(tuple(v))
+        cand = min(ev.evaluar(vecinos), key=lambda r: r.costo)
+        if cand.costo < mejor.costo:
+            mejor = cand
+        else:
+            paso /= 2
+    return mejor
+
+
+def frente_pareto(resultados):
+    """Resultados no dominados en (IAE, sobrepico, asentamiento, ciclos)."""
+    claves = np.array([[r.iae, r.sobrepico_cm, r.t_asentamiento_s, r.ciclos] for r in resultados])
+    frente = []
+    for i, c in enumerate(claves):
+        domina = np.all(claves <= c, axis=1) & np.any(claves < c, axis=1)
+        if not domina.any():
+            frente.append(resultados[i])
+    return sorted(frente, key=lambda r: r.costo)
+
+
+def imprimir_tabla(titulo, resultados, limite=10):
+    print(f"\n{titulo}")
+    print(f"{'#':>3} {'Kp':>7} {'Ki':>7} {'Kd':>7} {'ISE':>11} {'IAE':>10} {'Sobre':>7} {'Asent[s]':>9} {'Ciclos':>6} {'Costo':>8}")
+    for i, r in enumerate(resultados[:limite], 1):
+        print(f"{i:>3} {r.kp:7.4f} {r.ki:7.4f} {r.kd:7.4f} {r.ise:11.1f} {r.iae:10.1f} "
+              f"{r.sobrepico_cm:7.2f} {r.t_asentamiento_s:9.0f} {r.ciclos:6d} {r.costo:8.3f}")
+
+
+def leer_instalaciones(ruta):
+    """CSV con columna 'nombre' y cualquier campo de Prueba como columna."""
+    tipos = {c.name: c.type for c in fields(Prueba)}
+    pruebas = []
+    with open(ruta, encoding="utf-8-sig", newline="") as f:
+        for fila in csv.DictReader(f):
+            datos = {k: tipos[k](v) for k, v in fila.items() if k in tipos and v not in (None, "")}
+            pruebas.append(Prueba(**datos))
+    return pruebas
+
+
+def ajustar(prueba: Prueba, args, pesos: Pesos):
+    ev = Evaluador(prueba, pesos, args.procesos)
+    try:
+        t0 = time.perf_counter()
+        rangos = [rango(args.kp), rango(args.ki), rango(args.kd)]
+        grid = sorted(busqueda_grid(ev, *rangos), key=lambda r: r.costo)
+        t_grid = time.perf_counter() - t0
+        d = PIDGains()
+        actual = ev.evaluar([(d.kp, d.ki, d.kd)])[0]
+        mejor = grid[0]
+        if args.busqueda == "coordenadas":
+            # ganancia fija (un solo valor): paso relativo a su propio valor
+            escala = [(max(r) - min(r)) or max(abs(r[0]), 1e-3) for r in rangos]
+            mejor = descenso_coordenadas(ev, (mejor.kp, mejor.ki, mejor.kd), escala, max_iter=args.max_iter)
+        t_total = time.perf_counter() - t0
+    finally:
+        ev.cerrar()
+
+    todos = sorted(ev.memo.values(), key=lambda r: r.costo)
+    print(f"\n=== Instalación: {prueba.nombre} — {len(ev.memo)} pruebas en {t_total:.1f} s "
+          f"(grid {t_grid:.1f} s, {ev.procesos} procesos) ===")
+    imprimir_tabla("Ranking por costo", todos, args.top)
+    imprimir_tabla("Frente de Pareto (IAE, sobrepico, asentamiento, ciclos)", frente_pareto(todos), args.top)
+    imprimir_tabla("Ganancias actuales (PIDGains por defecto)", [actual], 1)
+    print(f"\nRecomendado: PIDGains(kp={mejor.kp:.4f}, ki={mejor.ki:.4f}, kd={mejor.kd:.4f})")
+    return mejor, todos
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Autoajuste offline de ganancias PID (tanque superior)")
+    ap.add_argument("--kp", default="0.02:0.4:8", help="rango a:b:n o valor fijo")
+    ap.add_argument("--ki", default="0:0.06:7")
+    ap.add_argument("--kd", default="0:0.2:6")
+    ap.add_argument("--busqueda", choices=("grid", "coordenadas"), default="coordenadas",
+                    help="'coordenadas' refina el mejor punto del grid")
+    ap.add_argument("--max-iter", type=int, default=30)
+    ap.add_argument("--procesos", type=int, default=None, help="por defecto, todos los núcleos")
+    ap.add_argument("--duracion", type=float, default=Prueba.duracion_s, help="segundos simulados por prueba")
+    ap.add_argument("--dt", type=float, default=Prueba.dt)
+    ap.add_argument("--setpoint", type=float, default=Prueba.setpoint_cm)
+    ap.add_argument("--instalaciones", help="CSV con una instalación por fila")
+    ap.add_argument("--csv", help="guarda todas las pruebas en este CSV")
+    ap.add_argument("--top", type=int, default=10)
+    ap.add_argument("--peso-iae", type=float, default=Pesos.iae)
+    ap.add_argument("--peso-sobrepico", type=float, default=Pesos.sobrepico)
+    ap.add_argument("--peso-asentamiento", type=float, default=Pesos.asentamiento)
+    ap.add_argument("--peso-ciclos", type=float, default=Pesos.ciclos)
+    args = ap.parse_args()
+
+    pesos = Pesos(args.peso_iae, args.peso_sobrepico, args.peso_asentamiento, args.peso_ciclos)
+    if args.instalaciones:
+        pruebas = leer_instalaciones(args.instalaciones)
+    else:
+        pruebas = [Prueba(setpoint_cm=args.setpoint, duracion_s=args.duracion, dt=args.dt)]
+
+    filas = []
+    for prueba in pruebas:
+        _, todos = ajustar(prueba, args, pesos)
+        filas += [{"instalacion": prueba.nombre, **asdict(r)} for r in todos]
+
+    if args.csv and filas:
+        with open(args.csv, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(filas[0]))
+            writer.writeheader()
+            writer.writerows(filas)
+        print(f"\nCSV: {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark reproducible del bucle de simulacion.py, sin ventana.
+
+Lanza simulacion.py con el driver de video 'dummy', sin Telegram ni registro
+de series, durante N frames sin tope de fps, y muestra los percentiles por
+etapa que exporta el perfilador. Cada frame avanza un número fijo de pasos
+de física (--pasos; a 60 fps el bucle real hace ~1 por frame): sin tope de
+fps el acumulador por reloj casi nunca llega a un paso y 'fisica' mediría
+frames vacíos.
+
+Con --comparar contrasta contra un JSON anterior y devuelve código 1 si el
+p95 de algún tramo empeora más de la tolerancia.
+
+Uso:
+    python bench_simulacion.py --frames 3000 --salida base.json
+    python bench_simulacion.py --comparar base.json --tolerancia 15
+"""
+import argparse, json, os, subprocess, sys, tempfile, time
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+
+
+def correr(frames: int, paneles: bool, overlay: bool, registrar: bool, fps: int, pasos: int) -> dict:
+    env = dict(os.environ)
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, "perfil.json")
+        env.update({
+            "SDL_VIDEODRIVER": "dummy",
+            "SDL_AUDIODRIVER": "dummy",
+            "TELEGRAM_ENABLED": "false",
+            "SEND_SCREENSHOTS": "false",
+            "CREATE_REPORT_FILES": "false",
+            "DAILY_REPORT_HOUR": "99",          # el reporte diario no entra en la medición
+            "REPLAY_SERIES": "",
+            "RECORD_SERIES": "true" if registrar else "false",
+            "SHOW_PANELS": "true" if paneles else "false",
+            "PROFILE_OVERLAY": "true" if overlay else "false",
+            "SIM_MAX_FRAMES": str(frames),
+            "SIM_FPS": str(fps),
+            "PHYSICS_FRAME_STEPS": str(pasos),
+            "PROFILE_EXPORT": ruta,
+        })
+        t0 = time.perf_counter()
+        proc = subprocess.run([sys.executable, os.path.join(AQUI, "simulacion.py")], cwd=AQUI, env=env,
+                              stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        seg = time.perf_counter() - t0
+        if proc.returncode != 0 or not os.path.exists(ruta):
+            sys.stderr.write(proc.stdout)
+            raise SystemExit(f"simulacion.py terminó con código {proc.returncode}")
+        with open(ruta, encoding="utf-8") as f:
+            datos = json.load(f)
+    datos["segundos_proceso"] = seg
+    return datos
+
+
+def imprimir(datos: dict) -> None:
+    print(f"{datos['frames']} frames, {datos['fps']:.1f} fps, "
+          f"{datos['frames_perdidos']} perdidos (objetivo {datos['fps_objetivo']:.0f} fps), "
+          f"proceso {datos['segundos_proceso']:.1f} s")
+    print(f"{'etapa':<10}{'p50':>8}{'p95':>8}{'p99':>8}{'media':>8}  ms")
+    for etapa, r in datos["ventana"].items():
+        print(f"{etapa:<10}{r['p50']:8.3f}{r['p95']:8.3f}{r['p99']:8.3f}{datos['media_total_ms'][etapa]:8.3f}")
+
+
+def comparar(base: dict, actual: dict, tolerancia: float) -> bool:
+    """Imprime el cambio de p50/p95 por etapa; False si algún p95 empeora más de 'tolerancia' %."""
+    ok = True
+    print(f"\n{'etapa':<10}{'p50 base':>10}{'p50':>8}{'p95 base':>10}{'p95':>8}{'Δp95':>8}")
+    for etapa, r in actual["ventana"].items():
+        b = base["ventana"].get(etapa)
+        if b is None:
+            continue
+        delta = (r["p95"] - b["p95"]) / b["p95"] * 100 if b["p95"] > 0 else 0.0
+        # por debajo de 0.05 ms el ruido del reloj domina: no se marca regresión
+        regresion = delta > tolerancia and r["p95"] - b["p95"] > 0.05
+        ok = ok and not regresion
+        print(f"{etapa:<10}{b['p50']:10.3f}{r['p50']:8.3f}{b['p95']:10.3f}{r['p95']:8.3f}{delta:+7.1f}%"
+              + ("  <-- regresión" if regresion else ""))
+    return ok
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark sin ventana del bucle de simulacion.py")
+    ap.add_argument("--frames", type=int, default=3000)
+    ap.add_argument("--fps", type=int, default=0, help="tope de fps (0 = sin tope)")
+    ap.add_argument("--pasos", type=int, default=1, help="pasos de física por frame (0 = según el reloj)")
+    ap.add_argument("--sin-paneles", action="store_true", help="no abre los paneles general y PID")
+    ap.add_argument("--overlay", action="store_true", help="incluye el overlay del perfilador")
+    ap.add_argument("--registrar", action="store_true", help="incluye el registro de series a disco")
+    ap.add_argument("--etiqueta", default="", help="nombre de la build/rama para el JSON")
+    ap.add_argument("--salida", help="guarda el resultado en este JSON")
+    ap.add_argument("--comparar", help="JSON de una corrida anterior")
+    ap.add_argument("--tolerancia", type=float, default=15, help="regresión máxima de p95 en %%")
+    args = ap.parse_args()
+
+    datos = correr(args.frames, not args.sin_paneles, args.overlay, args.registrar, args.fps, args.pasos)
+    datos["etiqueta"] = args.etiqueta
+    imprimir(datos)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(datos, f, indent=1)
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+        if not comparar(base, datos, args.tolerancia):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
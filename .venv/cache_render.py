@@ -0,0 +1,103 @@
+"""
+Cachés de render para la ventana del simulador.
+
+- CacheTextos: LRU de superficies de texto (texto, fuente, color).
+- CacheSuperficie: superficie que solo se vuelve a dibujar si cambia su clave.
+- Compositor: mantiene una capa estática pre-renderizada y redibuja solo las
+  zonas sucias del frame, devolviendo los rects para display.update().
+"""
+from collections import OrderedDict
+import pygame
+
+
+class CacheTextos:
+    def __init__(self, capacidad: int = 512):
+        self.capacidad = capacidad
+        self._cache = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def render(self, font, texto, color, antialias=True):
+        clave = (texto, id(font), tuple(color), antialias)
+        surf = self._cache.get(clave)
+        if surf is not None:
+            self._cache.move_to_end(clave)
+            self.aciertos += 1
+            return surf
+        self.fallos += 1
+        surf = font.render(texto, antialias, color)
+        self._cache[clave] = surf
+        if len(self._cache) > self.capacidad:
+            self._cache.popitem(last=False)
+        return surf
+
+
+class CacheSuperficie:
+    """Guarda la última superficie y la clave (valores mostrados) con que se dibujó."""
+    def __init__(self):
+        self.clave = None
+        self.surf = None
+
+    def obtener(self, clave, dibujar):
+        """Devuelve (superficie, cambió). dibujar() solo se llama si la clave es nueva."""
+        if self.surf is not None and clave == self.clave:
+            return self.surf, False
+        self.surf = dibujar()
+        self.clave = clave
+        return self.surf, True
+
+    def invalidar(self):
+        self.clave = None
+        self.surf = None
+
+
+class Compositor:
+    """
+    Redibuja solo las zonas marcadas como sucias: en cada una restaura la capa
+    estática y vuelve a pintar, recortadas a esa zona, las capas que la tocan.
+    """
+    def __init__(self, destino: pygame.Surface, fondo: pygame.Surface):
+        self.destino = destino
+        self.fondo = fondo
+        self._sucios = []
+        self.marcar_todo()
+
+    def marcar(self, rect):
+        r = pygame.Rect(rect).clip(self.destino.get_rect())
+        if r.w > 0 and r.h > 0:
+            self._sucios.append(r)
+
+    def marcar_todo(self):
+        self._sucios = [self.destino.get_rect()]
+
+    def componer(self, capas):
+        """
+        capas: lista ordenada de (rect, funcion_dibujo). Devuelve los rects
+        actualizados para pasarlos a pygame.display.update().
+        """
+        sucios = self._fusionar(self._sucios)
+        self._sucios = []
+        for r in sucios:
+            self.destino.set_clip(r)
+            self.destino.blit(self.fondo, r, r)
+            for rect, dibujar in capas:
+                if rect.colliderect(r):
+                    dibujar()
+        self.destino.set_clip(None)
+        return sucios
+
+    @staticmethod
+    def _fusionar(rects):
+        """Une rects solapados para no repintar dos veces la misma zona."""
+        res = []
+        for r in rects:
+            r = r.copy()
+            i = 0
+            while i < len(res):
+                if res[i].colliderect(r):
+                    r.union_ip(res.pop(i))
+                    i = 0
+                else:
+                    i += 1
+            res.append(r)
+        return res
@@ -0,0 +1,108 @@
+"""
+Capturas de pantalla fuera del hilo de render.
+
+En el hilo principal solo se copia la superficie de la ventana (Surface.copy)
+después de descartar las capturas repetidas. Un hilo trabajador reduce la
+imagen, la codifica a JPEG/PNG en memoria y la entrega a telegram.encolar_foto.
+Hay un tope de capturas por minuto para que una tormenta de alertas no sature
+el disco ni el enlace; las repetidas no lo consumen.
+
+Para decidir si una captura repite la anterior no sirve el frame crudo (el
+agua se anima en cada frame): se compara la 'clave' que pasa quien llama
+(el estado mostrado, p. ej. niveles redondeados y texto de alerta) o, si no
+hay clave, una miniatura cuantizada de la ventana.
+"""
+import io, time, queue, hashlib, threading
+from collections import deque
+import pygame
+from PIL import Image
+
+import telegram as tg
+
+
+class Capturador:
+    def __init__(self, escala: float = 0.5, formato: str = "jpeg", calidad: int = 80,
+                 max_por_minuto: int = 6, max_cola: int = 2):
+        self.escala = escala
+        self.formato = "png" if formato.lower() == "png" else "jpeg"
+        self.calidad = calidad
+        self.max_por_minuto = max_por_minuto
+        self._tiempos = deque()
+        self._ultimo_hash = None
+        self._cola: "queue.Queue" = queue.Queue(maxsize=max_cola)
+        self.metricas = {"encoladas": 0, "enviadas": 0, "repetidas": 0, "limitadas": 0, "descartadas": 0}
+        self._hilo = threading.Thread(target=self._trabajar, name="capturas", daemon=True)
+        self._hilo.start()
+
+    def capturar(self, superficie: pygame.Surface, caption: str = "", forzar: bool = False,
+                 clave=None) -> bool:
+        """
+        Copia el frame y lo deja en cola. forzar=True (pedidos del usuario,
+        reporte diario) ignora el tope por minuto y la detección de repetidos.
+        'clave' identifica lo que se muestra; si es igual a la de la última
+        captura enviada, no se vuelve a enviar.
+        """
+        ahora = time.monotonic()
+        huella = None
+        if not forzar:
+            huella = self.huella(superficie) if clave is None else hash(clave)
+            if huella == self._ultimo_hash:
+                self.metricas["repetidas"] += 1
+                return False
+            while self._tiempos and ahora - self._tiempos[0] > 60:
+                self._tiempos.popleft()
+            if len(self._tiempos) >= self.max_por_minuto:
+                self.metricas["limitadas"] += 1
+                return False
+        try:
+            self._cola.put_nowait((superficie.copy(), caption))
+        except queue.Full:
+            self.metricas["descartadas"] += 1
+            return False
+        if not forzar:
+            self._tiempos.append(ahora)
+            self._ultimo_hash = huella
+        self.metricas["encoladas"] += 1
+        return True
+
+    def detener(self, timeout: float = 5) -> None:
+        try:
+            self._cola.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._hilo.join(timeout)
+
+    @staticmethod
+    def huella(superficie: pygame.Surface, lado: int = 32) -> bytes:
+        """Hash de una miniatura de lado x lado con 3 bits por canal: ignora la animación fina."""
+        mini = pygame.transform.scale(superficie, (lado, lado))
+        crudo = bytes(b & 0xE0 for b in pygame.image.tobytes(mini, "RGB"))
+        return hashlib.blake2b(crudo, digest_size=16).digest()
+
+    def codificar(self, crudo: bytes, tam) -> bytes:
+        img = Image.frombytes("RGB", tam, crudo)
+        if self.escala != 1:
+            img = img.resize((max(1, int(tam[0] * self.escala)), max(1, int(tam[1] * self.escala))),
+                             Image.BILINEAR)
+        buf = io.BytesIO()
+        if self.formato == "jpeg":
+            img.save(buf, "JPEG", quality=self.calidad, optimize=True)
+        else:
+            img.save(buf, "PNG", compress_level=6)
+        return buf.getvalue()
+
+    def _trabajar(self) -> None:
+        while True:
+            item = self._cola.get()
+            if item is None:
+                return
+            copia, caption = item
+            crudo, tam = pygame.image.tobytes(copia, "RGB"), copia.get_size()
+            try:
+                datos = self.codificar(crudo, tam)
+            except Exception:
+                continue
+            nombre = "captura.png" if self.formato == "png" else "captura.jpg"
+            if tg.encolar_foto(datos, caption=caption, nombre=nombre):
+                self.metricas["enviadas"] += 1
+
@@ -0,0 +1,287 @@
+"""
+Motor de simulación por lotes (sin pygame).
+
+Reproduce el mismo modelo físico del bucle de simulacion.py (caudal de bomba,
+niveles de cisterna/tanque, auto-llenado PID y protección en seco) pero sobre
+arreglos NumPy, de modo que miles de escenarios avanzan juntos en cada paso.
+"""
+from dataclasses import dataclass, fields
+import numpy as np
+
+from pid_controller import PIDGains, PIDBank
+
+# ====== Constantes del modelo (mismas que simulacion.py) ======
+ALTO_CISTERNA_CM           = 200
+ALTO_TANQUE_SUP_CM         = 200
+ELEVACION_BASE_TANQUE_CM   = 250
+ALTURA_PRESION_CERO_CM     = 400
+FACTOR_PRESION_MIN         = 0.3
+MARGEN_SUMERGIDA_CM        = 2
+FACTOR_NO_SUMERGIDA        = 0.05
+DISTANCIA_SUELO_SEGURA_CM  = 50
+DISTANCIA_SUPERFICIE_SEGURA_CM = 20
+UMBRAL_SIN_AGUA_CM         = 1
+FACTOR_TIEMPO_SIMULACION   = 8      # segundos simulados por segundo real
+
+
+@dataclass
+class EscenariosLote:
+    """Parámetros por escenario; cada campo es un arreglo de largo N."""
+    area_cisterna_cm2: np.ndarray
+    area_tanque_sup_cm2: np.ndarray
+    caudal_bomba_max_lps: np.ndarray
+    caudal_entrada_lps: np.ndarray
+    consumo_tanque_sup_lps: np.ndarray   # (N,) constante o (N, K) perfil diario en K franjas
+    altura_boca_manguera_cm: np.ndarray
+    nivel_cisterna_cm: np.ndarray
+    nivel_tanque_sup_cm: np.ndarray
+    velocidad_bomba: np.ndarray
+    bomba_on: np.ndarray
+    entrada_on: np.ndarray
+    proteccion_seco_on: np.ndarray
+    pid_enabled: np.ndarray
+    pid_target_cm: np.ndarray
+    kp: np.ndarray
+    ki: np.ndarray
+    kd: np.ndarray
+    tau: np.ndarray
+    umbral_auto_off: np.ndarray
+    allow_pid_auto_start: np.ndarray
+
+    @property
+    def n(self) -> int:
+        return len(self.area_cisterna_cm2)
+
+
+_DEFECTOS = {
+    "area_cisterna_cm2": 25000,
+    "area_tanque_sup_cm2": 25000,
+    "caudal_bomba_max_lps": 1.5,
+    "caudal_entrada_lps": 0.8,
+    "consumo_tanque_sup_lps": 0.3,
+    "altura_boca_manguera_cm": 120,
+    "nivel_cisterna_cm": 140,
+    "nivel_tanque_sup_cm": 30,
+    "velocidad_bomba": 0.6,
+    "bomba_on": True,
+    "entrada_on": False,
+    "proteccion_seco_on": True,
+    "pid_enabled": False,
+    "pid_target_cm": 120,
+    "kp": PIDGains.kp,
+    "ki": PIDGains.ki,
+    "kd": PIDGains.kd,
+    "tau": 0.08,
+    "umbral_auto_off": 60,
+    "allow_pid_auto_start": True,
+}
+_BOOLEANOS = {"bomba_on", "entrada_on", "proteccion_seco_on", "pid_enabled", "allow_pid_auto_start"}
+
+
+def crear_escenarios(n: int, **params) -> EscenariosLote:
+    """
+    Crea N escenarios. Cada parámetro puede ser escalar (se replica) o arreglo.
+    Los valores omitidos toman los mismos defectos que simulacion.py.
+    """
+    desconocidos = set(params) - set(_DEFECTOS)
+    if desconocidos:
+        raise TypeError(f"Parámetros desconocidos: {', '.join(sorted(desconocidos))}")
+    valores = {}
+    for f in fields(EscenariosLote):
+        v = params.get(f.name, _DEFECTOS[f.name])
+        tipo = bool if f.name in _BOOLEANOS else np.float64
+        arr = np.asarray(v, dtype=tipo)
+        if f.name == "consumo_tanque_sup_lps" and arr.ndim == 2:
+            arr = np.broadcast_to(arr, (n, arr.shape[1])).copy()
+        else:
+            arr = np.broadcast_to(arr, (n,)).copy()
+        valores[f.name] = arr
+    return EscenariosLote(**valores)
+
+
+class MotorLote:
+    """Avanza N escenarios a la vez; el estado vive en arreglos NumPy."""
+
+    def __init__(self, esc: EscenariosLote, factor_tiempo: float = FACTOR_TIEMPO_SIMULACION):
+        self.esc = esc
+        self.factor_tiempo = factor_tiempo
+        n = esc.n
+        self.n = n
+        self.t = 0.0
+
+        # Estado de planta
+        self.nivel_cis = esc.nivel_cisterna_cm.copy()
+        self.nivel_sup = esc.nivel_tanque_sup_cm.copy()
+        self.boca = esc.altura_boca_manguera_cm.copy()
+        self.velocidad = esc.velocidad_bomba.copy()
+        self.bomba_on = esc.bomba_on.copy()
+        self.entrada_on = esc.entrada_on.copy()
+        self.auto_llenado = np.zeros(n, dtype=bool)
+        self.entrada_forzada = np.zeros(n, dtype=bool)
+        self.caudal_bomba = np.zeros(n)
+
+        # Estado PID
+        self.pid = PIDBank(n, umin=0, umax=1, tau=esc.tau, kp=esc.kp, ki=esc.ki, kd=esc.kd)
+
+        # Acumulados (mismas métricas que el reporte diario: los seg_* son
+        # segundos reales, dt / factor_tiempo, como en simulacion.py)
+        self.litros_bombeados = np.zeros(n)
+        self.litros_entrada = np.zeros(n)
+        self.litros_consumidos = np.zeros(n)
+        self.seg_bomba_encendida = np.zeros(n)
+        self.eventos_encendido_bomba = np.zeros(n, dtype=np.int64)
+        self.protecciones_en_seco = np.zeros(n, dtype=np.int64)
+        self.alertas = np.zeros(n, dtype=np.int64)
+        self.seg_pid_activo = np.zeros(n)
+        self.seg_pid_auto_llenado = np.zeros(n)
+        self.min_cis = self.nivel_cis.copy()
+        self.max_cis = self.nivel_cis.copy()
+        self.min_sup = self.nivel_sup.copy()
+        self.max_sup = self.nivel_sup.copy()
+        self._prev_bomba = np.zeros(n, dtype=bool)
+        self._prev_alerta = np.zeros(n, dtype=bool)
+
+    def consumo_actual(self) -> np.ndarray:
+        c = self.esc.consumo_tanque_sup_lps
+        if c.ndim == 1:
+            return c
+        k = c.shape[1]
+        franja = int((self.t % 86400) / 86400 * k) % k
+        return c[:, franja]
+
+    def paso(self, dt: float):
+        """Un paso de Euler de dt segundos simulados para todos los escenarios."""
+        esc = self.esc
+        li = DISTANCIA_SUELO_SEGURA_CM
+        ls = np.maximum(li, self.nivel_cis - DISTANCIA_SUPERFICIE_SEGURA_CM)
+        np.clip(self.boca, li, ls, out=self.boca)
+        np.clip(self.velocidad, 0, 1, out=self.velocidad)
+
+        entrada_lps = np.where(self.entrada_on, esc.caudal_entrada_lps, 0.0)
+        sumergida = self.nivel_cis > (self.boca + MARGEN_SUMERGIDA_CM)
+        factor_sumergida = np.where(sumergida, 1.0, FACTOR_NO_SUMERGIDA)
+        altura_entrega = np.maximum(0.0, ELEVACION_BASE_TANQUE_CM + self.nivel_sup - self.boca)
+        factor_presion = np.clip(1 - altura_entrega / ALTURA_PRESION_CERO_CM, FACTOR_PRESION_MIN, 1)
+
+        sin_agua_cis = self.nivel_cis <= UMBRAL_SIN_AGUA_CM
+        sin_agua_sup = self.nivel_sup <= UMBRAL_SIN_AGUA_CM
+
+        # ---- PID + auto-llenado ----
+        pid_on = esc.pid_enabled
+        if pid_on.any():
+            inicia = pid_on & sin_agua_cis & ~self.auto_llenado
+            self.auto_llenado |= inicia
+            self.entrada_forzada |= inicia
+
+            llenando = pid_on & self.auto_llenado
+            self.entrada_on |= llenando
+            self.velocidad[llenando] = 0
+            termina = llenando & (self.nivel_cis >= esc.umbral_auto_off)
+            self.auto_llenado &= ~termina
+            apaga_entrada = termina & self.entrada_forzada
+            self.entrada_on &= ~apaga_entrada
+            self.entrada_forzada &= ~apaga_entrada
+            puede_arrancar = esc.allow_pid_auto_start & (self.nivel_cis > self.boca + MARGEN_SUMERGIDA_CM)
+            self.bomba_on |= termina & puede_arrancar
+
+            regulando = pid_on & ~llenando
+            self.bomba_on |= regulando & ~self.bomba_on & puede_arrancar
+            regulando &= self.bomba_on
+            u = self.pid.step(esc.pid_target_cm, self.nivel_sup, dt, mascara=regulando)
+            np.copyto(self.velocidad, np.clip(u, 0, 1), where=regulando)
+
+        caudal = np.where(self.bomba_on, self.velocidad, 0.0) * esc.caudal_bomba_max_lps * factor_sumergida * factor_presion
+        self.caudal_bomba = caudal
+        consumo = self.consumo_actual()
+
+        self.nivel_cis += (entrada_lps - caudal) * 1000 * dt / esc.area_cisterna_cm2
+        np.clip(self.nivel_cis, 0, ALTO_CISTERNA_CM, out=self.nivel_cis)
+        self.nivel_sup += (caudal - consumo) * 1000 * dt / esc.area_tanque_sup_cm2
+        np.clip(self.nivel_sup, 0, ALTO_TANQUE_SUP_CM, out=self.nivel_sup)
+
+        # ---- Métricas ----
+        np.minimum(self.min_cis, self.nivel_cis, out=self.min_cis)
+        np.maximum(self.max_cis, self.nivel_cis, out=self.max_cis)
+        np.minimum(self.min_sup, self.nivel_sup, out=self.min_sup)
+        np.maximum(self.max_sup, self.nivel_sup, out=self.max_sup)
+        self.eventos_encendido_bomba += self.bomba_on & ~self._prev_bomba
+        self._prev_bomba[:] = self.bomba_on
+        alerta = sin_agua_cis | sin_agua_sup | (~sumergida & self.bomba_on)
+        self.alertas += alerta & ~self._prev_alerta
+        self._prev_alerta[:] = alerta
+        dt_real = dt / self.factor_tiempo
+        self.seg_bomba_encendida += np.where(self.bomba_on, dt_real, 0.0)
+        self.seg_pid_activo += np.where(pid_on, dt_real, 0.0)
+        self.seg_pid_auto_llenado += np.where(pid_on & self.auto_llenado, dt_real, 0.0)
+        if dt > 0:
+            self.litros_bombeados += np.maximum(caudal, 0) * dt
+            self.litros_entrada += np.maximum(entrada_lps, 0) * dt
+            self.litros_consumidos += np.maximum(consumo, 0) * dt
+
+        # ---- Protección en seco ----
+        disparo = ~sumergida & self.bomba_on & esc.proteccion_seco_on
+        self.bomba_on &= ~disparo
+        self.protecciones_en_seco += disparo
+
+        self.t += dt
+
+    def simular(self, duracion_s: float, dt: float = 0.1, cada_paso=None):
+        """
+        Avanza duracion_s segundos simulados con pasos fijos de dt.
+        cada_paso(motor) se llama tras cada paso si se indica.
+        """
+        pasos = int(round(duracion_s / dt))
+        for _ in range(pasos):
+            self.paso(dt)
+            if cada_paso is not None:
+                cada_paso(self)
+        return self
+
+    def resumen(self) -> dict:
+        """Métricas acumuladas por escenario (arreglos de largo N)."""
+        return {
+            "seg_bomba_encendida": self.seg_bomba_encendida,
+            "eventos_encendido_bomba": self.eventos_encendido_bomba,
+            "alertas": self.alertas,
+            "protecciones_en_seco": self.protecciones_en_seco,
+            "litros_bombeados": self.litros_bombeados,
+            "litros_entrada": self.litros_entrada,
+            "litros_consumidos": self.litros_consumidos,
+            "seg_pid_activo": self.seg_pid_activo,
+            "seg_pid_auto_llenado": self.seg_pid_auto_llenado,
+            "min_cis_cm": self.min_cis,
+            "max_cis_cm": self.max_cis,
+            "min_sup_cm": self.min_sup,
+            "max_sup_cm": self.max_sup,
+            "nivel_cisterna_cm": self.nivel_cis,
+            "nivel_tanque_sup_cm": self.nivel_sup,
+        }
+
+
+if __name__ == "__main__":
+    import argparse, time
+
+    ap = argparse.ArgumentParser(description="Simulación por lotes sin ventana")
+    ap.add_argument("-n", type=int, default=1000, help="número de escenarios")
+    ap.add_argument("--horas", type=float, default=24, help="tiempo simulado")
+    ap.add_argument("--dt", type=float, default=0.5, help="paso de integración [s]")
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    esc = crear_escenarios(
+        args.n,
+        area_cisterna_cm2=rng.uniform(15000, 40000, args.n),
+        caudal_bomba_max_lps=rng.uniform(0.8, 2.5, args.n),
+        consumo_tanque_sup_lps=rng.uniform(0.1, 0.6, args.n),
+        entrada_on=True,
+        pid_enabled=True,
+    )
+    motor = MotorLote(esc)
+    t0 = time.perf_counter()
+    motor.simular(args.horas * 3600, args.dt)
+    seg = time.perf_counter() - t0
+    r = motor.resumen()
+    print(f"{args.n} escenarios x {args.horas:g} h en {seg:.2f} s")
+    print(f"Tanque sup final: min {r['nivel_tanque_sup_cm'].min():.1f}  "
+          f"media {r['nivel_tanque_sup_cm'].mean():.1f}  max {r['nivel_tanque_sup_cm'].max():.1f} cm")
+    print(f"Protecciones en seco: {int(r['protecciones_en_seco'].sum())}")
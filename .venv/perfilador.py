@@ -0,0 +1,116 @@
+"""
+Perfilador por etapas del bucle principal.
+
+    perf.inicio_frame()
+    ...eventos...;  perf.marca("eventos")
+    ...física...;   perf.marca("fisica")
+    perf.fin_frame()
+
+marca() mide el tiempo desde la marca anterior. Se guardan las últimas
+'ventana' muestras por etapa (percentiles en vivo) y un histograma acumulado
+con cubetas logarítmicas para exportar y comparar entre versiones.
+"""
+import json, time, platform
+from bisect import bisect_right
+from datetime import datetime
+import numpy as np
+
+# Bordes de cubeta en ms: 0.01 ms … ~1 s, 10 cubetas por década
+BORDES_MS = [round(10 ** (e / 10), 4) for e in range(-20, 31)]
+
+
+class Perfilador:
+    def __init__(self, etapas, fps_objetivo: float = 60, ventana: int = 600):
+        self.etapas = list(etapas) + ["frame"]
+        self.periodo = 1 / fps_objetivo if fps_objetivo > 0 else 0
+        self.ventana = ventana
+        self._muestras = {e: np.zeros(ventana) for e in self.etapas}
+        self._hist = {e: [0] * (len(BORDES_MS) + 1) for e in self.etapas}
+        self._suma = dict.fromkeys(self.etapas, 0.0)
+        self._i = -1
+        self.frames = 0
+        self.frames_perdidos = 0
+        self._inicio = None
+        self._t = None
+        self._t_inicio_total = None
+
+    def inicio_frame(self) -> None:
+        ahora = time.perf_counter()
+        if self._inicio is not None and self.periodo:
+            # frames que no llegaron a mostrarse a tiempo desde el frame anterior
+            perdidos = int((ahora - self._inicio) / self.periodo + 0.5) - 1
+            if perdidos > 0:
+                self.frames_perdidos += perdidos
+        if self._t_inicio_total is None:
+            self._t_inicio_total = ahora
+        self._inicio = self._t = ahora
+        self._i = (self._i + 1) % self.ventana
+        self.frames += 1
+        for e in self.etapas:
+            self._muestras[e][self._i] = 0.0
+
+    def marca(self, etapa: str) -> None:
+        ahora = time.perf_counter()
+        self._registrar(etapa, ahora - self._t)
+        self._t = ahora
+
+    def fin_frame(self) -> None:
+        self._registrar("frame", time.perf_counter() - self._inicio)
+
+    def _registrar(self, etapa, seg) -> None:
+        self._muestras[etapa][self._i] += seg
+        ms = seg * 1000
+        self._hist[etapa][bisect_right(BORDES_MS, ms)] += 1
+        self._suma[etapa] += seg
+
+    # ---- Consultas ----
+    def resumen(self) -> dict:
+        """{etapa: {'p50','p95','p99','media'}} en ms sobre la ventana rodante."""
+        n = min(self.frames, self.ventana)
+        res = {}
+        for e in self.etapas:
+            if n == 0:
+                res[e] = {"p50": 0.0, "p95": 0.0, "p99": 0.0, "media": 0.0}
+                continue
+            m = self._muestras[e][:n] * 1000 if n < self.ventana else self._muestras[e] * 1000
+            p50, p95, p99 = np.percentile(m, (50, 95, 99))
+            res[e] = {"p50": float(p50), "p95": float(p95), "p99": float(p99), "media": float(m.mean())}
+        return res
+
+    def fps(self) -> float:
+        if self.frames < 2:
+            return 0.0
+        return (self.frames - 1) / max(self._inicio - self._t_inicio_total, 1e-9)
+
+    def exportar(self, ruta: str, etiqueta: str = "") -> str:
+        datos = {
+            "etiqueta": etiqueta,
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "fps_objetivo": 1 / self.periodo if self.periodo else 0,
+            "frames": self.frames,
+            "frames_perdidos": self.frames_perdidos,
+            "fps": self.fps(),
+            "ventana": self.resumen(),
+            "media_total_ms": {e: self._suma[e] * 1000 / max(self.frames, 1) for e in self.etapas},
+            "bordes_ms": BORDES_MS,
+            "histogramas": self._hist,
+        }
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump(datos, f, indent=1)
+        return ruta
+
+
+def percentil_histograma(cuentas, q: float) -> float:
+    """Percentil aproximado (ms) a partir de un histograma exportado."""
+    total = sum(cuentas)
+    if total == 0:
+        return 0.0
+    objetivo = q / 100 * total
+    acum = 0
+    for i, c in enumerate(cuentas):
+        acum += c
+        if acum >= objetivo:
+            return BORDES_MS[min(i, len(BORDES_MS) - 1)]
+    return BORDES_MS[-1]
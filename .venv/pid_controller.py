@@ -0,0 +1,127 @@
+from dataclasses import dataclass
+import numpy as np
+
+@dataclass
+class PIDGains:
+    kp: float = 0.08
+    ki: float = 0.02
+    kd: float = 0.04
+
+class PID:
+    __slots__ = ("kp", "ki", "kd", "umin", "umax", "tau", "bias", "_i", "_prev_pv", "_d_filt", "u")
+
+    def __init__(self, gains: PIDGains, umin=0, umax=1, tau=0.05, bias=0):
+        self.kp = gains.kp
+        self.ki = gains.ki
+        self.kd = gains.kd
+        self.umin = umin
+        self.umax = umax
+        self.tau = max(1e-6, tau)
+        self.bias = bias
+        self.reset()
+
+    def reset(self):
+        self._i = 0
+        self._prev_pv = None
+        self._d_filt = 0
+        self.u = 0
+
+    def set_gains(self, kp=None, ki=None, kd=None):
+        if kp is not None: self.kp = max(0, kp)
+        if ki is not None: self.ki = max(0, ki)
+        if kd is not None: self.kd = max(0, kd)
+
+    def step(self, setpoint: float, pv: float, dt: float) -> float:
+        if dt <= 0:
+            return self.u
+        e = setpoint - pv
+        p = self.kp * e
+        d_raw = 0
+        if self._prev_pv is not None:
+            d_meas = (pv - self._prev_pv) / dt
+            d_raw = -self.kd * d_meas
+            alpha = dt / (self.tau + dt)
+            self._d_filt += alpha * (d_raw - self._d_filt)
+        self._prev_pv = pv
+        d = self._d_filt
+        i_cand = self._i + self.ki * e * dt
+        u_sin = self.bias + p + i_cand + d
+        u = max(self.umin, min(self.umax, u_sin))
+        if not ((u_sin > self.umax and e > 0) or (u_sin < self.umin and e < 0)):
+            self._i = i_cand
+        self.u = u
+        return self.u
+
+class PIDBank:
+    """
+    N controladores PID en arreglos NumPy. step() avanza todos en una sola
+    llamada y da exactamente los mismos valores que N objetos PID.
+    Los parámetros pueden ser escalares (se replican) o arreglos de largo N.
+    """
+    def __init__(self, n: int, gains=None, umin=0, umax=1, tau=0.05, bias=0, kp=None, ki=None, kd=None):
+        gains = gains or PIDGains()
+        self.n = n
+        self.kp = self._arreglo(gains.kp if kp is None else kp)
+        self.ki = self._arreglo(gains.ki if ki is None else ki)
+        self.kd = self._arreglo(gains.kd if kd is None else kd)
+        self.umin = self._arreglo(umin)
+        self.umax = self._arreglo(umax)
+        self.tau = np.maximum(1e-6, self._arreglo(tau))
+        self.bias = self._arreglo(bias)
+        self._i = np.zeros(n)
+        self._prev_pv = np.zeros(n)
+        self._tiene_prev = np.zeros(n, dtype=bool)   # equivale a _prev_pv is not None
+        self._d_filt = np.zeros(n)
+        self.u = np.zeros(n)
+
+    def _arreglo(self, v):
+        return np.broadcast_to(np.asarray(v, dtype=np.float64), (self.n,)).copy()
+
+    def reset(self, mascara=None):
+        if mascara is None:
+            mascara = np.ones(self.n, dtype=bool)
+        self._i[mascara] = 0
+        self._prev_pv[mascara] = 0
+        self._tiene_prev[mascara] = False
+        self._d_filt[mascara] = 0
+        self.u[mascara] = 0
+
+    def set_gains(self, kp=None, ki=None, kd=None, mascara=None):
+        sel = slice(None) if mascara is None else mascara
+        if kp is not None: self.kp[sel] = np.maximum(0, kp)
+        if ki is not None: self.ki[sel] = np.maximum(0, ki)
+        if kd is not None: self.kd[sel] = np.maximum(0, kd)
+
+    def step(self, setpoints, pvs, dt, mascara=None) -> np.ndarray:
+        """
+        Avanza los controladores donde mascara es True (todos si es None) y
+        dt > 0. El resto conserva su estado y su última salida. Devuelve una
+        copia de las salidas: self.u se sobrescribe en el próximo paso.
+        """
+        dt = np.asarray(dt, dtype=np.float64)
+        activo = dt > 0
+        if mascara is not None:
+            activo = activo & mascara
+        if not np.any(activo):
+            return self.u.copy()
+        activo = np.broadcast_to(activo, (self.n,))
+        dt = np.where(dt > 0, dt, 1.0)   # evita divisiones por cero en los inactivos
+
+        e = setpoints - pvs
+        p = self.kp * e
+        with np.errstate(divide="ignore", invalid="ignore"):
+            d_raw = -self.kd * ((pvs - self._prev_pv) / dt)
+        alpha = dt / (self.tau + dt)
+        d_nuevo = self._d_filt + alpha * (d_raw - self._d_filt)
+        d = np.where(self._tiene_prev, d_nuevo, self._d_filt)
+        i_cand = self._i + self.ki * e * dt
+        u_sin = self.bias + p + i_cand + d
+        u = np.maximum(self.umin, np.minimum(self.umax, u_sin))
+        satura = ((u_sin > self.umax) & (e > 0)) | ((u_sin < self.umin) & (e < 0))
+
+        np.copyto(self._d_filt, d, where=activo)
+        np.copyto(self._prev_pv, pvs, where=activo)
+        self._tiene_prev |= activo
+        np.copyto(self._i, i_cand, where=activo & ~satura)
+        np.copyto(self.u, u, where=activo)
+        return self.u.copy()
@@ -0,0 +1,286 @@
+"""
+Registro de series de tiempo de alta frecuencia.
+
+El bucle principal escribe cada muestra en un buffer circular de arreglos
+NumPy (una asignación por columna). Cada 'bloque' muestras se vuelcan a disco
+en formato columnar: un .npy por columna dentro de segmentos de tamaño fijo
+(memmap), con un indice.json por día. Los archivos rotan a medianoche.
+
+Estructura:
+    reports/series/AAAAMMDD/indice.json
+    reports/series/AAAAMMDD/seg_0000/<columna>.npy
+
+Uso:
+    python registrador.py info 20251112
+    python registrador.py graficar 20251112 --columnas nivel_sup_cm nivel_cis_cm
+"""
+import os, json
+from datetime import datetime, date, timedelta
+import numpy as np
+
+COLUMNAS = {
+    "t": np.float64,                 # epoch [s]
+    "nivel_cis_cm": np.float32,
+    "nivel_sup_cm": np.float32,
+    "caudal_bomba_lps": np.float32,
+    "caudal_entrada_lps": np.float32,
+    "velocidad_bomba": np.float32,
+    "u_pid": np.float32,
+    "boca_cm": np.float32,
+    "estado": np.uint8,              # bits, ver ESTADO_*
+}
+ESTADO_BOMBA   = 1
+ESTADO_ENTRADA = 2
+ESTADO_PID     = 4
+ESTADO_AUTO    = 8
+ESTADO_ALERTA  = 16
+
+CARPETA_SERIES = os.path.join(os.path.dirname(__file__), "reports", "series")
+
+
+def _carpeta_dia(carpeta, dia) -> str:
+    if isinstance(dia, (date, datetime)):
+        dia = dia.strftime("%Y%m%d")
+    return os.path.join(carpeta, str(dia))
+
+def _leer_indice(ruta_dia) -> dict:
+    try:
+        with open(os.path.join(ruta_dia, "indice.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"columnas": {k: np.dtype(v).str for k, v in COLUMNAS.items()}, "segmentos": []}
+
+def _escribir_indice(ruta_dia, indice) -> None:
+    tmp = os.path.join(ruta_dia, "indice.json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(indice, f)
+    os.replace(tmp, os.path.join(ruta_dia, "indice.json"))
+
+
+class Registrador:
+    """
+    registrar() cuesta una comparación y una asignación por columna; el volcado
+    a disco ocurre cada 'bloque' muestras. Si el disco falla, el buffer sigue
+    funcionando como anillo (se pisan las muestras más viejas).
+    """
+    def __init__(self, carpeta: str = CARPETA_SERIES, hz: float = 10, capacidad: int = 8192,
+                 bloque: int = 2048, filas_segmento: int = 65536):
+        self.carpeta = carpeta
+        self.periodo = 1 / hz if hz > 0 else 0
+        self.capacidad = capacidad
+        self.bloque = min(bloque, capacidad)
+        self.filas_segmento = filas_segmento
+        self._buf = {k: np.zeros(capacidad, dtype=v) for k, v in COLUMNAS.items()}
+        self._escritura = 0        # total de muestras registradas
+        self._volcadas = 0         # total de muestras ya en disco
+        self._proxima_t = 0.0
+        self._fin_dia = 0.0
+        self._dia = None
+        self._indice = None
+        self._seg = None           # dict columna -> memmap del segmento abierto
+        self._seg_filas = 0
+
+    def registrar(self, t, nivel_cis, nivel_sup, caudal_bomba, caudal_entrada,
+                  velocidad, u_pid, boca, estado) -> None:
+        if t < self._proxima_t:
+            return
+        self._proxima_t = t + self.periodo
+        if t >= self._fin_dia:
+            self._rotar(t)
+        i = self._escritura % self.capacidad
+        b = self._buf
+        b["t"][i] = t
+        b["nivel_cis_cm"][i] = nivel_cis
+        b["nivel_sup_cm"][i] = nivel_sup
+        b["caudal_bomba_lps"][i] = caudal_bomba
+        b["caudal_entrada_lps"][i] = caudal_entrada
+        b["velocidad_bomba"][i] = velocidad
+        b["u_pid"][i] = u_pid
+        b["boca_cm"][i] = boca
+        b["estado"][i] = estado
+        self._escritura += 1
+        if self._escritura - self._volcadas >= self.bloque:
+            self.volcar()
+
+    def ultimos(self, n: int) -> dict:
+        """Últimas n muestras en memoria (sin tocar disco)."""
+        n = min(n, self._escritura, self.capacidad)
+        idx = np.arange(self._escritura - n, self._escritura) % self.capacidad
+        return {k: v[idx] for k, v in self._buf.items()}
+
+    def volcar(self) -> None:
+        pendientes = self._escritura - self._volcadas
+        if pendientes <= 0 or self._dia is None:
+            return
+        if pendientes > self.capacidad:   # el anillo ya pisó muestras no volcadas
+            self._volcadas = self._escritura - self.capacidad
+            pendientes = self.capacidad
+        try:
+            while pendientes > 0:
+                if self._seg is None or self._seg_filas >= self.filas_segmento:
+                    self._abrir_segmento()
+                n = min(pendientes, self.filas_segmento - self._seg_filas)
+                idx = np.arange(self._volcadas, self._volcadas + n) % self.capacidad
+                for k, mm in self._seg.items():
+                    mm[self._seg_filas:self._seg_filas + n] = self._buf[k][idx]
+                self._seg_filas += n
+                self._volcadas += n
+                pendientes -= n
+                meta = self._indice["segmentos"][-1]
+                meta["n"] = self._seg_filas
+                meta["t_fin"] = float(self._seg["t"][self._seg_filas - 1])
+            for mm in self._seg.values():
+                mm.flush()
+            _escribir_indice(self._ruta_dia, self._indice)
+        except OSError:
+            self._seg = None   # se reintenta en el próximo bloque
+
+    def cerrar(self) -> None:
+        self.volcar()
+        self._seg = None
+
+    def _rotar(self, t) -> None:
+        self.volcar()
+        dia = datetime.fromtimestamp(t).date()
+        self._dia = dia
+        self._fin_dia = datetime.combine(dia + timedelta(days=1), datetime.min.time()).timestamp()
+        self._ruta_dia = _carpeta_dia(self.carpeta, dia)
+        self._indice = _leer_indice(self._ruta_dia)
+        self._seg = None
+
+    def _abrir_segmento(self) -> None:
+        os.makedirs(self._ruta_dia, exist_ok=True)
+        nombre = f"seg_{len(self._indice['segmentos']):04d}"
+        ruta_seg = os.path.join(self._ruta_dia, nombre)
+        os.makedirs(ruta_seg, exist_ok=True)
+        self._seg = {
+            k: np.lib.format.open_memmap(os.path.join(ruta_seg, f"{k}.npy"), mode="w+",
+                                         dtype=v, shape=(self.filas_segmento,))
+            for k, v in COLUMNAS.items()
+        }
+        self._seg_filas = 0
+        t_ini = float(self._buf["t"][self._volcadas % self.capacidad])
+        self._indice["segmentos"].append({"nombre": nombre, "n": 0, "t_ini": t_ini, "t_fin": t_ini})
+
+
+class LectorSeries:
+    """Lee un día por segmentos memmap: nunca carga el día entero en RAM."""
+    def __init__(self, dia, carpeta: str = CARPETA_SERIES):
+        self.ruta = _carpeta_dia(carpeta, dia)
+        self.indice = _leer_indice(self.ruta)
+        self.segmentos = [s for s in self.indice["segmentos"] if s["n"] > 0]
+
+    def __len__(self) -> int:
+        return sum(s["n"] for s in self.segmentos)
+
+    @property
+    def t_ini(self):
+        return self.segmentos[0]["t_ini"] if self.segmentos else None
+
+    @property
+    def t_fin(self):
+        return self.segmentos[-1]["t_fin"] if self.segmentos else None
+
+    def _columna(self, seg, columna):
+        ruta = os.path.join(self.ruta, seg["nombre"], f"{columna}.npy")
+        return np.load(ruta, mmap_mode="r")[:seg["n"]]
+
+    def bloques(self, columnas=None, t0=None, t1=None):
+        """Itera dicts columna -> arreglo, un segmento (o parte) por vez."""
+        columnas = list(columnas or COLUMNAS)
+        if "t" not in columnas:
+            columnas = ["t"] + columnas
+        for seg in self.segmentos:
+            if (t0 is not None and seg["t_fin"] < t0) or (t1 is not None and seg["t_ini"] > t1):
+                continue
+            t = self._columna(seg, "t")
+            a = 0 if t0 is None else int(np.searchsorted(t, t0, "left"))
+            b = len(t) if t1 is None else int(np.searchsorted(t, t1, "right"))
+            if a >= b:
+                continue
+            yield {c: self._columna(seg, c)[a:b] for c in columnas}
+
+    def diezmar(self, columna: str, puntos: int = 2000, t0=None, t1=None):
+        """(t, mínimo, máximo) en 'puntos' cubetas, calculado bloque a bloque."""
+        t0 = self.t_ini if t0 is None else t0
+        t1 = self.t_fin if t1 is None else t1
+        if t0 is None:
+            vacio = np.array([])
+            return vacio, vacio, vacio
+        ancho = max((t1 - t0) / puntos, 1e-9)
+        mn = np.full(puntos, np.inf)
+        mx = np.full(puntos, -np.inf)
+        for b in self.bloques([columna], t0, t1):
+            cub = np.minimum(((b["t"] - t0) / ancho).astype(np.int64), puntos - 1)
+            v = b[columna].astype(np.float64)
+            np.minimum.at(mn, cub, v)
+            np.maximum.at(mx, cub, v)
+        ok = np.isfinite(mn)
+        t = t0 + (np.arange(puntos) + 0.5) * ancho
+        return t[ok], mn[ok], mx[ok]
+
+
+class Reproductor:
+    """
+    Devuelve la muestra grabada para un instante relativo al inicio del día
+    grabado. Avanza segmento a segmento, así que solo hay uno mapeado a la vez.
+    """
+    def __init__(self, lector: LectorSeries, velocidad: float = 1.0, t_inicio=None):
+        self.lector = lector
+        self.velocidad = velocidad
+        self.t_inicio = lector.t_ini if t_inicio is None else t_inicio
+        self._bloques = lector.bloques(t0=self.t_inicio)
+        self._actual = None
+        self._i = 0
+
+    def muestra(self, segundos: float):
+        """Muestra vigente 'segundos' (reales) después del inicio; None al terminar."""
+        t = self.t_inicio + segundos * self.velocidad
+        while True:
+            if self._actual is None:
+                self._actual = next(self._bloques, None)
+                self._i = 0
+                if self._actual is None:
+                    return None
+            ts = self._actual["t"]
+            if t <= ts[-1]:
+                self._i = max(self._i, int(np.searchsorted(ts, t, "right")) - 1, 0)
+                return {k: v[self._i].item() for k, v in self._actual.items()}
+            self._actual = None
+
+
+def _main():
+    import argparse
+    ap = argparse.ArgumentParser(description="Series de tiempo del simulador")
+    ap.add_argument("accion", choices=("info", "graficar"))
+    ap.add_argument("dia", help="AAAAMMDD")
+    ap.add_argument("--columnas", nargs="+", default=["nivel_cis_cm", "nivel_sup_cm"])
+    ap.add_argument("--puntos", type=int, default=2000)
+    args = ap.parse_args()
+
+    lector = LectorSeries(args.dia)
+    if not lector.segmentos:
+        raise SystemExit(f"Sin datos en {lector.ruta}")
+    if args.accion == "info":
+        fmt = lambda t: datetime.fromtimestamp(t).strftime("%H:%M:%S")
+        print(f"{len(lector)} muestras en {len(lector.segmentos)} segmentos, "
+              f"{fmt(lector.t_ini)}–{fmt(lector.t_fin)}")
+        return
+
+    import matplotlib.pyplot as plt
+    from matplotlib.dates import DateFormatter
+    fig, ax = plt.subplots(figsize=(12, 5))
+    for col in args.columnas:
+        t, mn, mx = lector.diezmar(col, args.puntos)
+        fechas = [datetime.fromtimestamp(x) for x in t]
+        ax.fill_between(fechas, mn, mx, alpha=0.3)
+        ax.plot(fechas, (mn + mx) / 2, label=col, linewidth=1)
+    ax.xaxis.set_major_formatter(DateFormatter("%H:%M"))
+    ax.set_title(f"Series {args.dia}")
+    ax.legend()
+    ax.grid(alpha=0.3)
+    plt.show()
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,1287 @@
+import pygame, math, wave, struct, os, csv, time
+from pid_controller import PID, PIDGains
+from cache_render import CacheTextos, CacheSuperficie, Compositor
+import registrador as reg
+from agregador_metricas import AgregadorMetricas, CAMPOS_CSV, fila_csv
+
+# ================= Telegram + métricas =================
+from datetime import datetime, date, timedelta
+from dotenv import load_dotenv
+import telegram as tg   # usa nuestro telegram.py (no instales el paquete "telegram")
+from captura import Capturador
+from perfilador import Perfilador
+
+load_dotenv()
+
+# Respeto nombres del .env; variables internas en español
+ENVIAR_CAPTURAS        = os.getenv("SEND_SCREENSHOTS", "false").lower() == "true"
+HORA_REPORTE_DIARIO    = int(os.getenv("DAILY_REPORT_HOUR", "20"))  # 20 = 8pm
+CREAR_ARCHIVOS_REPORTE = os.getenv("CREATE_REPORT_FILES", "true").lower() == "true"
+CARPETA_REPORTES       = os.path.join(os.path.dirname(__file__), "reports")
+ESCALA_CAPTURA         = float(os.getenv("SCREENSHOT_SCALE", "0.5"))
+FORMATO_CAPTURA        = os.getenv("SCREENSHOT_FORMAT", "jpeg")       # jpeg | png
+CALIDAD_CAPTURA        = int(os.getenv("SCREENSHOT_QUALITY", "80"))
+CAPTURAS_POR_MINUTO    = int(os.getenv("SCREENSHOTS_PER_MINUTE", "6"))
+os.makedirs(CARPETA_REPORTES, exist_ok=True)
+
+# Series de tiempo: REPLAY_SERIES=AAAAMMDD reproduce un día grabado en vez de simular
+REGISTRAR_SERIES  = os.getenv("RECORD_SERIES", "true").lower() == "true"
+HZ_SERIES         = float(os.getenv("RECORD_SERIES_HZ", "10"))
+DIA_REPRODUCCION  = os.getenv("REPLAY_SERIES", "")
+VELOCIDAD_REPLAY  = float(os.getenv("REPLAY_SPEED", "1"))
+
+reproductor = None
+fin_reproduccion = False
+if DIA_REPRODUCCION:
+    lector_replay = reg.LectorSeries(DIA_REPRODUCCION)
+    if not lector_replay.segmentos:
+        # sin esto se caería a una corrida en vivo que graba y manda alertas
+        raise SystemExit(f"REPLAY_SERIES={DIA_REPRODUCCION}: no hay series grabadas en {lector_replay.ruta}")
+    reproductor = reg.Reproductor(lector_replay, velocidad=VELOCIDAD_REPLAY)
+registrador = reg.Registrador(hz=HZ_SERIES) if (REGISTRAR_SERIES and reproductor is None) else None
+
+# Perfilador por etapas: [O] muestra/oculta el overlay, [E] exporta a reports/perfil_*.json
+MOSTRAR_PERFIL   = os.getenv("PROFILE_OVERLAY", "false").lower() == "true"
+RUTA_PERFIL      = os.getenv("PROFILE_EXPORT", "")          # exporta al salir (bench_simulacion.py)
+FPS_OBJETIVO     = int(os.getenv("SIM_FPS", "60"))           # 0 = sin tope de fps
+MAX_FRAMES       = int(os.getenv("SIM_MAX_FRAMES", "0"))     # 0 = sin límite
+MOSTRAR_PANELES  = os.getenv("SHOW_PANELS", "false").lower() == "true"
+perfilador = Perfilador(("eventos", "fisica", "alertas", "dibujo", "reporte", "display"),
+                        fps_objetivo=60)
+
+# Física de paso fijo: [N] alterna el avance rápido (salta al próximo evento sin dibujar)
+PASO_FISICA_S   = float(os.getenv("PHYSICS_STEP", "0.125"))    # segundos simulados por paso
+MAX_PASOS_FRAME = int(os.getenv("PHYSICS_MAX_STEPS", "240"))   # tope por frame; el resto se descarta
+AVANCE_RAPIDO   = os.getenv("FAST_FORWARD", "false").lower() == "true"
+MAX_HORAS_SIM   = float(os.getenv("SIM_MAX_HOURS", "0"))       # 0 = sin límite
+PASOS_FIJOS     = int(os.getenv("PHYSICS_FRAME_STEPS", "0"))    # >0: pasos por frame sin mirar el reloj (benchmark)
+
+# Antirebotes
+antirebote_alertas = tg.Debouncer(min_interval_sec=30)
+antirebote_pid     = tg.Debouncer(min_interval_sec=120)
+
+# Capturas: se codifican en un hilo aparte y se envían desde memoria
+capturador = Capturador(escala=ESCALA_CAPTURA, formato=FORMATO_CAPTURA, calidad=CALIDAD_CAPTURA,
+                        max_por_minuto=CAPTURAS_POR_MINUTO)
+
+# --------- Métricas: ver 'agregador' (AgregadorMetricas) más abajo ----------
+_fecha_ultimo_reporte = None
+
+# --------- Menú de reportes on-demand ---------
+menu_visible = False
+rect_boton_menu = None
+rect_menu = None
+rect_menu_rep = None
+rect_menu_csv = None
+rect_menu_png = None
+rect_menu_short = None
+
+# ====== Helpers de texto (solo DISEÑO) ======
+def _sep():  # separador simple y limpio
+    return "<i>────────────────────────</i>\n"
+
+def _h1(t):
+    return f"<b>{t}</b>\n{_sep()}"
+
+def _item(nombre, valor):
+    return f"• {nombre}: <b>{valor}</b>\n"
+
+def _fmt_tabla(pares, ancho=0):
+    """
+    pares: [("Etiqueta","Valor"), ...]
+    Salida en monoespaciado alineado.
+    """
+    filas = [f"{k:<{ancho}} {v}" for k, v in pares]
+    return "<pre>" + "\n".join(filas) + "</pre>\n"
+
+def _rango(a, b, sufijo=" cm"):
+    a = "-" if a is None else f"{a:.2f}"
+    b = "-" if b is None else f"{b:.2f}"
+    return f"{a}–{b}{sufijo}"
+
+
+def _pct(p):
+    return "-" if p is None else f"{p:.1f}"
+
+def crear_texto_reporte_diario(hoy: date) -> str:
+    m = agregador.rollup_dia()
+    estado = [
+        ("Bomba encendida:", f"{m['seg_bomba_encendida']/60:.1f} min"),
+        ("Encendidos:", f"{m['eventos_encendido_bomba']}"),
+        ("Alertas:", f"{m['alertas']}"),
+        ("Protección seco:", f"{m['protecciones_en_seco']}"),
+    ]
+    pid = [
+        ("PID activo:", f"{m['seg_pid_activo']/60:.1f} min"),
+        ("Auto llenado:", f"{m['seg_pid_auto_llenado']/60:.1f} min"),
+    ]
+    caudales = [
+        ("Bombeado:", f"{m['litros_bombeados']:.1f} L"),
+        ("Entrada:", f"{m['litros_entrada']:.1f} L"),
+        ("Consumo:", f"{m['litros_consumidos']:.1f} L"),
+    ]
+    p_cis = agregador.percentiles("nivel_cis_cm")
+    p_sup = agregador.percentiles("nivel_sup_cm")
+    niveles = [
+        ("Cisterna min–max:", _rango(m['min_cis_cm'], m['max_cis_cm'])),
+        ("Tanque min–max:", _rango(m['min_sup_cm'], m['max_sup_cm'])),
+        ("Cisterna p5/50/95:", f"{_pct(p_cis[5])}/{_pct(p_cis[50])}/{_pct(p_cis[95])} cm"),
+        ("Tanque p5/50/95:", f"{_pct(p_sup[5])}/{_pct(p_sup[50])}/{_pct(p_sup[95])} cm"),
+    ]
+
+    return (
+        _h1(f"📅 Reporte diario — {hoy.strftime('%Y-%m-%d')}") +
+        "📋 <b>Estado</b>\n" + _fmt_tabla(estado) +
+        "🤖 <b>PID</b>\n" + _fmt_tabla(pid) +
+        "💧 <b>Entrada</b>\n" + _fmt_tabla(caudales) +
+        "📏 <b>Niveles</b>\n" + _fmt_tabla(niveles)
+    )
+
+
+def crear_texto_resumen_corto(ahora: datetime) -> str:
+    m = agregador.rollup_dia()
+    filas = [
+        ("Cisterna min–max:", _rango(m['min_cis_cm'], m['max_cis_cm'])),
+        ("Tanque min–max:", _rango(m['min_sup_cm'], m['max_sup_cm'])),
+        ("Bombeado hoy:", f"{m['litros_bombeados']:.1f} L"),
+        ("Alertas:", f"{m['alertas']}"),
+    ]
+    hora = agregador.resumen_ventana("1h")
+    if hora["nivel_sup_cm"] is not None:
+        sup = hora["nivel_sup_cm"]
+        filas += [
+            ("Tanque última hora:", _rango(sup["min"], sup["max"])),
+            ("Bomba última hora:", f"{hora['bomba']['media']*100:.0f} % del tiempo"),
+        ]
+    return _h1(f"📝 Resumen {ahora.strftime('%Y-%m-%d %H:%M')}") + _fmt_tabla(filas)
+
+
+def escribir_csv_diario(hoy: date) -> str:
+    # Archivo (acumula por día) – columnas ordenadas y legibles para Excel
+    ruta = os.path.join(CARPETA_REPORTES, f"reporte_{hoy.strftime('%Y%m%d')}.csv")
+    encabezados = ["fecha"] + CAMPOS_CSV
+
+    nuevo = not os.path.exists(ruta)
+    fila = {"fecha": hoy.isoformat(), **fila_csv(agregador.rollup_dia())}
+
+    with open(ruta, "a", encoding="utf-8-sig", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=encabezados)
+        if nuevo:
+            f.write("sep=,\n")
+            writer.writeheader()
+        writer.writerow(fila)
+    return ruta
+
+
+def escribir_csv_instantaneo(ahora: datetime) -> str:
+    ruta = os.path.join(CARPETA_REPORTES, f"snapshot_{ahora.strftime('%Y%m%d_%H%M%S')}.csv")
+    encabezados = ["timestamp"] + CAMPOS_CSV
+    fila = {"timestamp": ahora.isoformat(timespec="seconds"), **fila_csv(agregador.rollup_dia())}
+
+    with open(ruta, "w", encoding="utf-8-sig", newline="") as f:
+        f.write("sep=,\n")
+        writer = csv.DictWriter(f, fieldnames=encabezados)
+        writer.writeheader()
+        writer.writerow(fila)
+    return ruta
+
+
+def reiniciar_metricas_diarias():
+    agregador.reiniciar_dia()
+
+def _clave_captura(texto: str):
+    """Lo que muestra la pantalla a efectos de repetir o no una captura."""
+    return (round(nivel_cisterna_cm), round(nivel_tanque_sup_cm), bomba_on, texto)
+
+def _enviar(texto: str):
+    tg.encolar_mensaje(texto)
+    if ENVIAR_CAPTURAS:
+        capturador.capturar(ventana, caption="📷 Estado visual del simulador", clave=_clave_captura(texto))
+
+def notificar_alerta(texto_alerta: str, msg_pid: str):
+    if not texto_alerta and not msg_pid:
+        return
+
+    titulo = "🚨 ALERTA" if texto_alerta else "🤖 PID"
+    detalle = texto_alerta if texto_alerta else msg_pid
+
+    tabla = _fmt_tabla([
+        ("Cisterna:", f"{nivel_cisterna_cm:4.1f}"),
+        ("Tanque superior:", f"{nivel_tanque_sup_cm:4.1f}"),
+    ])
+
+    texto = _h1(f"{titulo}") + _item("Detalle", detalle) + "\n" + tabla
+
+    if texto_alerta:
+        if antirebote_alertas.should_send(f"A|{texto_alerta}|{int(nivel_cisterna_cm)}|{int(nivel_tanque_sup_cm)}"):
+            tg.encolar_mensaje(texto)
+            if ENVIAR_CAPTURAS:
+                capturador.capturar(ventana, caption="📷 Estado visual del simulador",
+                                    clave=_clave_captura(texto_alerta))
+    else:
+        if antirebote_pid.should_send(f"P|{msg_pid}|{int(nivel_tanque_sup_cm)}"):
+            tg.encolar_mensaje(texto)
+
+
+# ====== Acciones del MENÚ ======
+def accion_enviar_reporte_ahora():
+    ahora = datetime.now()
+    txt = _h1("📊 <b>Reporte inmediato</b>") + crear_texto_reporte_diario(ahora.date())
+    tg.encolar_mensaje(txt)
+    if ENVIAR_CAPTURAS:
+        capturador.capturar(ventana, caption="📷 Captura instantánea", forzar=True)
+
+def accion_enviar_csv_ahora():
+    if not CREAR_ARCHIVOS_REPORTE:
+        tg.encolar_mensaje("️🗒️ CSV deshabilitado")
+        return
+
+    ahora = datetime.now()
+
+    try:
+        ruta_csv = escribir_csv_instantaneo(ahora)
+    except Exception as e:
+        tg.encolar_mensaje(
+            "⚠️ No pude crear el CSV instantáneo.\n"
+            f"<pre>{type(e).__name__}: {e}</pre>"
+        )
+        return
+
+    def _al_terminar(ok):
+        if not ok:
+            tg.encolar_mensaje(
+                "⚠️ No pude enviar el CSV por Telegram.\n"
+                "Revisa TELEGRAM_BOT_TOKEN y TELEGRAM_CHAT_ID en tu .env."
+            )
+
+    tg.encolar_documento(ruta_csv, caption="📄 CSV instantáneo", al_terminar=_al_terminar)
+
+
+def accion_enviar_png_ahora():
+    ahora = datetime.now()
+    try:
+        ok = capturador.capturar(ventana, caption=f"📷 Captura {ahora.strftime('%H:%M:%S')}", forzar=True)
+    except Exception:
+        ok = False
+    if not ok:
+        tg.encolar_mensaje("⚠️ Error al capturar/enviar imagen.")
+
+def accion_enviar_resumen_ahora():
+    ahora = datetime.now()
+    tg.encolar_mensaje(crear_texto_resumen_corto(ahora))
+
+# =================== Pygame ===================
+def crear_beep_wav(ruta:str, freq=880, dur_s=0.30, vol=0.6, samplerate=44100):
+    nframes = int(dur_s * samplerate)
+    amp = int(32767 * max(0, min(vol, 1)))
+    with wave.open(ruta, "w") as wf:
+        wf.setnchannels(1); wf.setsampwidth(2); wf.setframerate(samplerate)
+        for i in range(nframes):
+            t = i / samplerate
+            wf.writeframes(struct.pack("<h", int(amp * math.sin(2*math.pi*freq*t))))
+
+pygame.mixer.pre_init(44100, -16, 2, 512)
+pygame.init()
+ancho_ventana, alto_ventana = 1300, 700
+ventana = pygame.display.set_mode((ancho_ventana, alto_ventana))
+pygame.display.set_caption("Simulación Bomba de Agua + PID")
+reloj = pygame.time.Clock()
+fuente_titulo = pygame.font.SysFont("consolas", 20, bold=True)
+fuente_med    = pygame.font.SysFont("consolas", 16)
+fuente_peq    = pygame.font.SysFont("consolas", 14)
+textos = CacheTextos()
+
+# Colores
+color_fondo        = (245, 247, 250)
+color_linea        = (30, 33, 38)
+color_texto        = (32, 36, 40)
+color_texto_sec    = (110, 110, 110)
+color_agua_oscuro  = (40, 95, 210)
+color_agua_medio   = (60, 120, 240)
+color_agua_claro   = (90, 160, 255)
+color_tubo         = (30, 33, 38)
+color_flotador     = (255, 210, 0)
+color_bomba_cuerpo = (210, 210, 210)
+color_bomba_borde  = (32, 36, 40)
+color_hormigon     = (220, 222, 226)
+color_hormigon_r   = (170, 170, 175)
+color_panel_fondo   = (255, 255, 255)
+color_panel_borde   = (206, 210, 220)
+color_panel_texto   = (35, 38, 45)
+color_panel_sutil   = (225, 229, 236)
+color_panel_ok      = (17, 148, 70)
+color_panel_alerta  = (206, 148, 18)
+color_panel_peligro = (206, 55, 55)
+color_acento        = (68, 134, 255)
+color_barra_track   = (234, 238, 244)
+color_barra_fill    = (68, 134, 255)
+color_barra_borde   = (195, 202, 214)
+color_boton_fondo   = (40, 42, 48)
+color_boton_borde   = (210, 210, 210)
+color_boton_texto   = (240, 240, 240)
+
+# Botón “panel”
+rect_boton_panel  = pygame.Rect(ancho_ventana - 170, alto_ventana - 54, 150, 38)
+
+y_suelo = 320
+ancho_camara_total = 410
+alto_cisterna_px   = 220
+x_cisterna         = 520
+rect_cisterna = pygame.Rect(x_cisterna, y_suelo + 20, ancho_camara_total, alto_cisterna_px)
+grosor_muro = 4
+def rect_interno(r):
+    return pygame.Rect(r.x + grosor_muro, r.y + grosor_muro, r.w - 2*grosor_muro, r.h - 2*grosor_muro)
+rect_cisterna_int = rect_interno(rect_cisterna)
+ancho_bomba, alto_bomba = 130, 55
+rect_bomba = pygame.Rect(rect_cisterna.x + 20, y_suelo - alto_bomba - 12, ancho_bomba, alto_bomba)
+rect_tanque_superior = pygame.Rect(170, 70, 280, 220)
+
+# Paneles
+panel_visible = MOSTRAR_PANELES
+rect_panel = pygame.Rect(ancho_ventana - 425, 0, 380, 315)
+pid_panel_visible = MOSTRAR_PANELES
+rect_pid_panel = pygame.Rect(100, 350, 300, 200)
+perfil_visible = MOSTRAR_PERFIL
+rect_perfil_panel = pygame.Rect(470, 0, 380, 170)      # entre el tanque superior y el panel general
+
+
+btn_w, btn_h, btn_gap = 150, 38, 10
+rect_boton_panel     = pygame.Rect(ancho_ventana-170, alto_ventana-54, btn_w, btn_h)
+rect_btn_vac_cis     = pygame.Rect(rect_boton_panel.x-(btn_w+btn_gap),   alto_ventana-54, btn_w, btn_h)
+rect_btn_vac_sup     = pygame.Rect(rect_boton_panel.x-(btn_w+btn_gap)*2, alto_ventana-54, btn_w, btn_h)
+rect_btn_pid_panel   = pygame.Rect(rect_boton_panel.x-(btn_w+btn_gap)*3, alto_ventana-54, btn_w, btn_h)
+rect_boton_menu      = pygame.Rect(rect_boton_panel.x-(btn_w+btn_gap)*4, alto_ventana-54, btn_w, btn_h)
+
+menu_x, menu_y = 970, 340
+menu_w, menu_h = 280, 220
+
+def get_menu_layout():
+    global rect_menu, rect_menu_rep, rect_menu_csv, rect_menu_png, rect_menu_short
+    rect_menu = pygame.Rect(menu_x, menu_y, menu_w, menu_h)
+
+    # Botones internos (relativos al panel)
+    bx, by, bw, bh, gap = menu_x + 16, menu_y + 50, menu_w - 32, 32, 10
+    rect_menu_rep   = pygame.Rect(bx, by + 0*(bh+gap), bw, bh)
+    rect_menu_csv   = pygame.Rect(bx, by + 1*(bh+gap), bw, bh)
+    rect_menu_png   = pygame.Rect(bx, by + 2*(bh+gap), bw, bh)
+    rect_menu_short = pygame.Rect(bx, by + 3*(bh+gap), bw, bh)
+
+get_menu_layout()
+
+# Escalas y estados
+alto_cisterna_cm   = 200
+alto_tanque_sup_cm = 200
+px_por_cm_cis = (rect_cisterna.h-2*grosor_muro)/alto_cisterna_cm
+px_por_cm_sup = (rect_tanque_superior.h - 20) / alto_tanque_sup_cm
+fondo_px_cis  = rect_cisterna.bottom-grosor_muro
+fondo_px_sup  = rect_tanque_superior.bottom - 10
+def cm_a_y_cis(v): return int(fondo_px_cis - v * px_por_cm_cis)
+def cm_a_y_sup(v): return int(fondo_px_sup - v * px_por_cm_sup)
+
+nivel_cisterna_cm       = 140
+nivel_tanque_sup_cm     = 30
+altura_boca_manguera_cm = 120
+bomba_on        = True
+velocidad_bomba = 0.6
+entrada_on      = False
+
+caudal_entrada_lps_activo = 0.8
+caudal_bomba_max_lps      = 1.5
+consumo_tanque_sup_lps    = 0.3
+
+area_cisterna_cm2   = 25000
+area_tanque_sup_cm2 = 25000
+
+# Métricas del día + ventanas rodantes (reportes y CSV leen de aquí)
+agregador = AgregadorMetricas(alto_cisterna_cm, alto_tanque_sup_cm, caudal_bomba_max_lps)
+
+distancia_suelo_segura_cm      = 50
+distancia_superficie_segura_cm = 20
+factor_tiempo_simulacion       = float(os.getenv("SIM_TIME_FACTOR", "8"))
+
+# Alarmas
+umbral_sin_agua_cm = 1
+proteccion_seco_on = True
+alarma_mute = False
+alarma_vol  = 0.9
+parpadeo_t  = 0
+
+# PID
+pid_enabled   = False
+pid_target_cm = 120
+pid = PID(PIDGains(kp=0.08, ki=0.02, kd=0.04), umin=0, umax=1, tau=0.08)
+
+# Auto-llenado PID
+auto_llenado_activo     = False
+entrada_forzada_por_pid = False
+umbral_auto_on  = 50
+umbral_auto_off = 60
+allow_pid_auto_start = True
+
+# Audio
+ruta_beep = os.path.join(os.path.dirname(__file__), "_beep_temp.wav")
+try:
+    crear_beep_wav(ruta_beep, 900, 0.35, 1)
+    sonido_beep  = pygame.mixer.Sound(ruta_beep)
+    sonido_beep.set_volume(alarma_vol)
+    canal_alarma = pygame.mixer.Channel(0)
+except Exception:
+    sonido_beep = None
+    canal_alarma = None
+
+def limitar(v, a, b):
+    if v < a: return a
+    if v > b: return b
+    return v
+
+def dibujar_texto(s, t, x, y, c=(32,36,40), f=None):
+    f = f or fuente_med
+    s.blit(textos.render(f, t, c), (x, y))
+
+def agua_gradiente(s, x, y, w, h):
+    if h <= 0: return
+    pygame.draw.rect(s, color_agua_oscuro, (x, y, w, h))
+    h2 = int(h*0.6)
+    if h2>0: pygame.draw.rect(s, color_agua_medio, (x, y, w, h2))
+    h3 = int(h*0.3)
+    if h3>0: pygame.draw.rect(s, color_agua_claro, (x, y, w, h3))
+
+def superficie(s, x0, x1, yb, t, col):
+    pts, paso, x = [], 10, x0
+    while x <= x1:
+        off = math.sin((x*0.08) + t*3) * 2
+        pts.append((x, yb + off)); x += paso
+    if len(pts) >= 2: pygame.draw.lines(s, col, False, pts, 2)
+
+def barra_h(s, x, y, w, h, p):
+    pygame.draw.rect(s, color_barra_track, (x, y, w, h), border_radius=6)
+    w2 = int(w * (p/100))
+    if w2>0: pygame.draw.rect(s, color_barra_fill, (x, y, w2, h), border_radius=6)
+    pygame.draw.rect(s, color_barra_borde, (x, y, w, h), 2, border_radius=6)
+
+def chip_estado(surf, x, y, texto, activo, font=None):
+    font = font or fuente_peq
+    pad_x=12; h=22
+    tw,th = font.size(texto)
+    w = max(100, 26 + tw + 8)
+    r=pygame.Rect(x,y,w,h)
+    pygame.draw.rect(surf, (234,238,244), r, border_radius=10)
+    pygame.draw.rect(surf, (195,202,214), r, 1, border_radius=10)
+    col=(20,160,90) if activo else (150,150,150)
+    pygame.draw.circle(surf, col, (r.x+12, r.y+h//2), 6)
+    surf.blit(textos.render(font, texto, color_panel_texto), (r.x+26, r.y+(h-th)//2))
+    return r.right
+
+def dibujar_chips_en_filas(surf, x, y, datos, chips_por_fila=3, gap_x=10, gap_y=30):
+    """
+    datos: lista de tuplas (texto, activo)
+    chips_por_fila: cuántos chips por fila (3 => 2 filas para 6 chips)
+    Devuelve la nueva coordenada y tras pintar los chips.
+    """
+    x_inicio = x
+    en_fila = 0
+    for texto, activo in datos:
+        right = chip_estado(surf, x, y, texto, activo)
+        x = right + gap_x
+        en_fila += 1
+        if en_fila >= chips_por_fila:
+            y += gap_y
+            x = x_inicio
+            en_fila = 0
+    if en_fila > 0:
+        y += gap_y
+    return y
+
+
+def dibujar_texto_envuelto(surf, texto, x, y, max_w, color=color_panel_texto, font=None, gap=4):
+    font = font or fuente_peq
+    if not texto: return y
+    palabras = texto.split(' ')
+    linea = ""
+    for w in palabras:
+        t = (linea + (" " if linea else "") + w)
+        if font.size(t)[0] <= max_w:
+            linea = t
+        else:
+            surf.blit(textos.render(font, linea, color), (x, y))
+            y += font.get_linesize() + gap
+            linea = w
+    if linea:
+        surf.blit(textos.render(font, linea, color), (x, y))
+        y += font.get_linesize() + gap
+    return y
+
+def dibujar_etiqueta_valor(surf, x, y, w, etiqueta, valor, font=None, color=color_panel_texto):
+    font = font or fuente_peq
+    lw, lh = font.size(etiqueta)
+    vw, _  = font.size(valor)
+    surf.blit(textos.render(font, etiqueta, color), (x, y))
+    surf.blit(textos.render(font, valor, color), (x + w - vw, y))
+    return y + font.get_linesize() + 2
+
+def crear_superficie_panel(rect, titulo):
+    surf = pygame.Surface((rect.w, rect.h), pygame.SRCALPHA)
+    padding = 16
+    inner = pygame.Rect(padding, padding, rect.w - 2*padding, rect.h - 2*padding)
+    surf.set_clip(inner)
+    y_titulo = padding
+    t_surf = textos.render(fuente_titulo, titulo, color_panel_texto)
+    surf.blit(t_surf, (padding, y_titulo))
+    sep_y = y_titulo + t_surf.get_height() + 8
+    pygame.draw.line(surf, color_panel_sutil, (padding, sep_y), (rect.w - padding, sep_y), 1)
+    return surf, padding, sep_y + 12, inner
+
+def pegar_superficie_panel(surf, rect):
+    """Compone sombra + fondo + contenido en una superficie lista para blit en rect.topleft."""
+    final = pygame.Surface((rect.w + 5, rect.h + 5), pygame.SRCALPHA)
+    pygame.draw.rect(final, (0,0,0,20), pygame.Rect(5, 5, rect.w, rect.h), border_radius=5)
+    r = pygame.Rect(0, 0, rect.w, rect.h)
+    pygame.draw.rect(final, color_panel_fondo, r, border_radius=12)
+    pygame.draw.rect(final, color_panel_borde, r, 7, border_radius=12)
+    final.blit(surf, (0, 0))
+    return final
+
+def con_sombra(rect):
+    return pygame.Rect(rect.x, rect.y, rect.w + 5, rect.h + 5)
+
+def dibujar_tanque_superior_base(s):
+    pygame.draw.rect(s, (240,240,240), rect_tanque_superior, border_radius=6)
+    pygame.draw.rect(s, color_linea, rect_tanque_superior, 2, border_radius=6)
+    dibujar_texto(s, "Tanque superior", rect_tanque_superior.x, rect_tanque_superior.y - 24, (32,36,40), fuente_peq)
+
+def dibujar_tanque_superior(nivel, t):
+    m = 10; x = rect_tanque_superior.x + m; y = rect_tanque_superior.y + m
+    w = rect_tanque_superior.w - 2*m; h = rect_tanque_superior.h - 2*m
+    ys = cm_a_y_sup(nivel); yi = y + h
+    if ys < yi:
+        agua_gradiente(ventana, x, ys, w, yi-ys)
+        superficie(ventana, x, x+w, ys, t, color_linea)
+
+def dibujar_cisterna_base(s):
+    pygame.draw.rect(s, color_linea, rect_cisterna, grosor_muro, border_radius=4)
+    y_tubo = rect_cisterna_int.y + 35
+    x_izq  = rect_cisterna.x - 100
+    dibujar_texto(s, "Entrada de agua", x_izq, y_tubo - 20, (110,110,110), fuente_peq)
+
+def dibujar_cisterna(nivel, boca, t, entrada_activa):
+    y_sup = cm_a_y_cis(nivel)
+    yi = rect_cisterna_int.bottom
+    if y_sup < yi:
+        agua_gradiente(ventana, rect_cisterna_int.x, y_sup, rect_cisterna_int.w, yi - y_sup)
+        superficie(ventana, rect_cisterna_int.x, rect_cisterna_int.right, y_sup, t, color_linea)
+    fx = rect_cisterna_int.x + int(rect_cisterna_int.w * 0.62)
+    fy = y_sup - 8
+    pygame.draw.circle(ventana, (255,210,0), (fx, fy), 12)
+    pygame.draw.circle(ventana, color_linea, (fx, fy), 12, 2)
+    xt = rect_cisterna_int.x + int(rect_cisterna_int.w * 0.78)
+    yt = rect_cisterna_int.y + 15
+    yb = cm_a_y_cis(boca)
+    pygame.draw.line(ventana, color_tubo, (xt, yt), (xt, yb), 6)
+    pygame.draw.circle(ventana, color_tubo, (xt, yb), 8)
+    y_tubo = rect_cisterna_int.y + 35
+    x_izq  = rect_cisterna.x - 100
+    x_codo = rect_cisterna_int.x + 15
+    pygame.draw.line(ventana, color_tubo, (x_izq, y_tubo), (x_codo, y_tubo), 10)
+    if entrada_activa:
+        pygame.draw.line(ventana, color_acento, (x_izq+2, y_tubo), (x_codo-2, y_tubo), 5)
+        pygame.draw.line(ventana, color_acento, (x_codo, y_tubo-2), (x_codo, y_tubo+175), 5)
+    # La losa va por encima del flotador cuando la cisterna está llena
+    ventana.blit(fondo_estatico, rect_losa_cis, rect_losa_cis)
+
+def dibujar_losa_y_terreno(s):
+    rect_losa = pygame.Rect(rect_cisterna.x, y_suelo, rect_cisterna.right - rect_cisterna.x, 14)
+    pygame.draw.rect(s, color_hormigon, rect_losa)
+    dx = rect_losa.x - 40
+    while dx < rect_losa.right + 40:
+        pygame.draw.line(s, color_hormigon_r, (dx, rect_losa.y+2), (dx-26, rect_losa.bottom-2), 1)
+        dx += 12
+    h = 30
+    pygame.draw.rect(s, color_linea, (rect_cisterna.x + 20, y_suelo - h, 10, h))
+    pygame.draw.rect(s, color_linea, (rect_cisterna.x + 20, y_suelo - h, 70, 10))
+    pygame.draw.rect(s, color_linea, (rect_cisterna.right - 30, y_suelo - h, 10, h))
+    pygame.draw.rect(s, color_linea, (rect_cisterna.right - 30, y_suelo - h, 70, 10))
+    pygame.draw.line(s, (140,140,140), (100, y_suelo), (ancho_ventana-100, y_suelo), 3)
+
+def dibujar_bomba_y_tuberias(s):
+    x_toma = rect_cisterna_int.x + int(rect_cisterna_int.w * 0.78)
+    y_linea_bomba = rect_bomba.centery
+    pygame.draw.line(s, color_tubo, (x_toma, y_suelo), (x_toma, y_linea_bomba), 8)
+    pygame.draw.line(s, color_tubo, (x_toma, y_linea_bomba), (rect_bomba.x, y_linea_bomba), 8)
+    pygame.draw.rect(s, color_bomba_cuerpo, rect_bomba, border_radius=6)
+    rect_cabezal = pygame.Rect(rect_bomba.right - 5, rect_bomba.centery - 15, 28, 30)
+    pygame.draw.ellipse(s, color_bomba_cuerpo, rect_cabezal)
+    pygame.draw.ellipse(s, color_bomba_borde, rect_cabezal, 2)
+    rect_asa = pygame.Rect(rect_bomba.centerx - 15, rect_bomba.y - 10, 30, 10)
+    pygame.draw.rect(s, color_bomba_cuerpo, rect_asa, border_radius=4)
+    pygame.draw.rect(s, color_bomba_borde, rect_asa, 2, border_radius=4)
+    dibujar_texto(s, "Bomba", rect_bomba.x + 8, rect_bomba.y - 24, (32,36,40), fuente_peq)
+    x_salida = rect_cabezal.right
+    y_salida = rect_bomba.centery
+    y_altura_tanque = rect_tanque_superior.y + rect_tanque_superior.h // 2
+    pygame.draw.line(s, color_tubo, (x_salida, y_salida), (x_salida, y_altura_tanque), 8)
+    pygame.draw.line(s, color_tubo, (x_salida, y_altura_tanque), (rect_tanque_superior.x, y_altura_tanque), 6)
+    pygame.draw.line(s, color_tubo, (rect_tanque_superior.x, y_altura_tanque),
+                     (rect_tanque_superior.x, rect_tanque_superior.y + 24), 6)
+
+def dibujar_controles(s):
+    t = "[ESPACIO] bomba  [↑/↓] velocidad  [W/S] manguera  [I] entrada  [R] reset  [M] mute [V/T/X] vaciar [Q] PID [F] Panel PID  [H] Menú"
+    y = rect_cisterna.bottom + 30
+    w, h = fuente_peq.size(t)
+    x = (ancho_ventana//2) - (w//2)
+    px, py = 16, 10
+    r = pygame.Rect(x-px, y-py, w+2*px, h+2*py)
+    pygame.draw.rect(s, (235,238,245), r, border_radius=8)
+    pygame.draw.rect(s, (180,184,192), r, 2, border_radius=8)
+    dibujar_texto(s, t, x, y, (70,75,85), fuente_peq)
+
+def dibujar_boton_panel(activo):
+    pygame.draw.rect(ventana, color_boton_fondo, rect_boton_panel, border_radius=8)
+    pygame.draw.rect(ventana, color_boton_borde, rect_boton_panel, 2, border_radius=8)
+    etiqueta = "Ocultar panel" if activo else "Mostrar panel"
+    dibujar_texto(ventana, etiqueta, rect_boton_panel.x + 18, rect_boton_panel.y + 10, color_boton_texto, fuente_med)
+
+def dibujar_boton(s, r, txt):
+    pygame.draw.rect(s, color_boton_fondo, r, border_radius=8)
+    pygame.draw.rect(s, color_boton_borde, r, 2, border_radius=8)
+    w,h = fuente_med.size(txt)
+    dibujar_texto(s, txt, r.x+(r.w-w)//2, r.y+(r.h-h)//2, color_boton_texto, fuente_med)
+
+def crear_fondo_estatico():
+    """Todo lo que no cambia entre frames, pintado una sola vez."""
+    s = pygame.Surface((ancho_ventana, alto_ventana)).convert()
+    s.fill(color_fondo)
+    dibujar_tanque_superior_base(s)
+    dibujar_bomba_y_tuberias(s)
+    dibujar_cisterna_base(s)
+    dibujar_losa_y_terreno(s)
+    dibujar_controles(s)
+    dibujar_boton(s, rect_boton_menu, "Menú")
+    dibujar_boton(s, rect_btn_pid_panel, "Panel PID")
+    dibujar_boton(s, rect_btn_vac_sup, "Vaciar tanque")
+    dibujar_boton(s, rect_btn_vac_cis, "Vaciar cisterna")
+    return s
+
+def _ancho_barra(w, p):
+    return int(w * (p/100))
+
+def dibujar_panel_general(q_bomba_lps, q_entrada_lps, texto_alerta):
+    if not panel_visible: return None
+    w_barra = rect_panel.w - 32
+    clave = (bomba_on, entrada_on, proteccion_seco_on, alarma_mute, pid_enabled, pid_panel_visible,
+             f"{velocidad_bomba*100:5.1f}", _ancho_barra(w_barra, velocidad_bomba*100),
+             f"{nivel_cisterna_cm:5.1f}", _ancho_barra(w_barra, (nivel_cisterna_cm/alto_cisterna_cm)*100),
+             f"{nivel_tanque_sup_cm:5.1f}", _ancho_barra(w_barra, (nivel_tanque_sup_cm/alto_tanque_sup_cm)*100),
+             f"{q_bomba_lps*60:5.1f}", f"{q_entrada_lps*60:5.1f}", texto_alerta)
+    surf, cambio = cache_panel_general.obtener(clave, lambda: _render_panel_general(q_bomba_lps, q_entrada_lps, texto_alerta))
+    return cambio
+
+def _render_panel_general(q_bomba_lps, q_entrada_lps, texto_alerta):
+    surf, pad, y, inner = crear_superficie_panel(rect_panel, "Panel de simulación")
+    x = pad; w = inner.w
+    datos_chips = [
+        ("Bomba", bomba_on),
+        ("Entrada", entrada_on),
+        ("Protección", proteccion_seco_on),
+        ("Alarma", not alarma_mute),
+        ("PID", pid_enabled),
+        ("Panel PID", pid_panel_visible),
+    ]
+    y = dibujar_chips_en_filas(surf, x, y, datos_chips, chips_por_fila=3, gap_x=10, gap_y=30)
+    y = dibujar_etiqueta_valor(surf, x, y, w, "Velocidad bomba", f"{velocidad_bomba*100:5.1f}%")
+    barra_h(surf, x, y, w, 10, velocidad_bomba*100); y += 18
+    y = dibujar_etiqueta_valor(surf, x, y, w, "Cisterna", f"{nivel_cisterna_cm:5.1f} cm")
+    barra_h(surf, x, y, w, 10, (nivel_cisterna_cm/alto_cisterna_cm)*100); y += 18
+    y = dibujar_etiqueta_valor(surf, x, y, w, "Tanque sup", f"{nivel_tanque_sup_cm:5.1f} cm")
+    barra_h(surf, x, y, w, 10, (nivel_tanque_sup_cm/alto_tanque_sup_cm)*100); y += 10
+    y += 8
+    y = dibujar_etiqueta_valor(surf, x, y, w, "Bomba",   f"{q_bomba_lps*60:5.1f} L/min")
+    y = dibujar_etiqueta_valor(surf, x, y, w, "Entrada", f"{q_entrada_lps*60:5.1f} L/min")
+    y += 6
+    if texto_alerta:
+        y = dibujar_texto_envuelto(surf, texto_alerta, x, y, w, color_panel_peligro, fuente_peq, gap=2)
+    else:
+        y = dibujar_texto_envuelto(surf, "Sin alertas", x, y, w, color_panel_ok, fuente_peq, gap=2)
+    return pegar_superficie_panel(surf, rect_panel)
+
+def dibujar_panel_pid():
+    if not pid_panel_visible: return None
+    clave = (pid_enabled,)
+    if pid_enabled:
+        clave += (f"{pid_target_cm:5.1f}", f"{nivel_tanque_sup_cm:5.1f}", f"{pid_target_cm - nivel_tanque_sup_cm:5.1f}",
+                  f"{pid.kp:.3f}", f"{pid.ki:.3f}", f"{pid.kd:.3f}", f"{velocidad_bomba*100:5.1f}")
+    surf, cambio = cache_panel_pid.obtener(clave, _render_panel_pid)
+    return cambio
+
+def _render_panel_pid():
+    surf, pad, y, inner = crear_superficie_panel(rect_pid_panel, "Panel PID")
+    x = pad; w = inner.w
+    chip_estado(surf, x, y, "PID", pid_enabled); y += 30
+    if pid_enabled:
+        y = dibujar_etiqueta_valor(surf, x, y, w, "Setpoint (SP)", f"{pid_target_cm:5.1f} cm")
+        y = dibujar_etiqueta_valor(surf, x, y, w, "Proceso (PV)",  f"{nivel_tanque_sup_cm:5.1f} cm")
+        e = pid_target_cm - nivel_tanque_sup_cm
+        y = dibujar_etiqueta_valor(surf, x, y, w, "Error (SP-PV)", f"{e:5.1f} cm")
+        y += 4
+        y = dibujar_texto_envuelto(surf, f"Kp:{pid.kp:.3f}    Ki:{pid.ki:.3f}    Kd:{pid.kd:.3f}",
+                              x, y, w, color_panel_texto, fuente_peq, gap=2)
+        y = dibujar_etiqueta_valor(surf, x, y, w, "Salida u", f"{velocidad_bomba*100:5.1f} %")
+    else:
+        y = dibujar_texto_envuelto(surf, "PID desactivado (pulsa Q).", x, y, w, (110,110,110), fuente_peq)
+    return pegar_superficie_panel(surf, rect_pid_panel)
+
+_superficie_banner = {}
+def _banner(alto, color, alpha):
+    surf = _superficie_banner.get(alto)
+    if surf is None:
+        surf = _superficie_banner[alto] = pygame.Surface((ancho_ventana, alto), pygame.SRCALPHA)
+    surf.fill((*color, alpha))
+    return surf
+
+def dibujar_banner_alerta(texto,t):
+    fase=(math.sin(t*8)+1)/2; alpha=int(80+120*fase)
+    ventana.blit(_banner(38,(255,40,40),alpha),(0,0))
+    dibujar_texto(ventana,texto,16,10,(255,255,255),fuente_med)
+
+def dibujar_banner_pid(texto,t,offset_y=40):
+    fase=(math.sin(t*6)+1)/2; alpha=int(60+110*fase)
+    ventana.blit(_banner(30,(68,134,255),alpha),(0,offset_y))
+    dibujar_texto(ventana,texto,16,offset_y+6,(255,255,255),fuente_peq)
+
+def _render_menu():
+    surf = pygame.Surface((rect_menu.w + 5, rect_menu.h + 5), pygame.SRCALPHA)
+    pygame.draw.rect(surf, (0,0,0,20), pygame.Rect(5, 5, rect_menu.w, rect_menu.h), border_radius=5)
+    r = pygame.Rect(0, 0, rect_menu.w, rect_menu.h)
+    pygame.draw.rect(surf, (255,255,255), r, border_radius=12)
+    pygame.draw.rect(surf, (206,210,220), r, 6, border_radius=12)
+    dibujar_texto(surf, "Menú de reportes", 16, 14, (35,38,45), fuente_titulo)
+
+    def _dibujar_boton(rr, label):
+        rr = rr.move(-rect_menu.x, -rect_menu.y)
+        pygame.draw.rect(surf, color_boton_fondo, rr, border_radius=8)
+        pygame.draw.rect(surf, color_boton_borde, rr, 2, border_radius=8)
+        w,h = fuente_med.size(label)
+        dibujar_texto(surf, label, rr.x + (rr.w - w)//2, rr.y + (rr.h - h)//2, color_boton_texto, fuente_med)
+
+    _dibujar_boton(rect_menu_rep,   "Reporte inmediato")
+    _dibujar_boton(rect_menu_csv,   "CSV instantáneo")
+    _dibujar_boton(rect_menu_png,   "Captura PNG")
+    _dibujar_boton(rect_menu_short, "Resumen corto")
+    return surf
+
+def dibujar_menu():
+    if not menu_visible: return
+    surf, _ = cache_menu.obtener(rect_menu.topleft, _render_menu)
+    ventana.blit(surf, rect_menu.topleft)
+
+def dibujar_panel_perfil():
+    if not perfil_visible: return None
+    # se recalcula dos veces por segundo: los percentiles no cambian más rápido que eso
+    surf, cambio = cache_panel_perfil.obtener(int(time.monotonic() * 2), _render_panel_perfil)
+    return cambio
+
+def _render_panel_perfil():
+    surf, pad, y, inner = crear_superficie_panel(rect_perfil_panel, "Perfil de frame")
+    x = pad; w = inner.w
+    # una sola fila para FPS y perdidos: el panel tiene que caber sobre la cañería del tanque superior
+    y = dibujar_etiqueta_valor(surf, x, y, w, "FPS / frames perdidos (60 fps)",
+                               f"{perfilador.fps():5.1f} / {perfilador.frames_perdidos}")
+    y += 4
+    # textos que cambian en cada refresco: sin pasar por el caché LRU
+    surf.blit(fuente_peq.render(f"{'etapa':<9}{'p50':>7}{'p95':>7}{'p99':>7}  ms", True, color_texto_sec), (x, y))
+    y += fuente_peq.get_linesize() + 2
+    for etapa, r in perfilador.resumen().items():
+        color = color_panel_texto if etapa != "frame" else color_acento
+        linea = f"{etapa:<9}{r['p50']:7.2f}{r['p95']:7.2f}{r['p99']:7.2f}"
+        surf.blit(fuente_peq.render(linea, True, color), (x, y))
+        y += fuente_peq.get_linesize()
+    return pegar_superficie_panel(surf, rect_perfil_panel)
+
+def exportar_perfil(ruta=None):
+    if ruta is None:
+        ruta = os.path.join(CARPETA_REPORTES, f"perfil_{datetime.now():%Y%m%d_%H%M%S}.json")
+    try:
+        perfilador.exportar(ruta)
+        print(f"[perfil] exportado a {ruta}")
+    except OSError as e:
+        print(f"[perfil] no se pudo exportar: {e}")
+
+# ====== Capas y zonas sucias ======
+fondo_estatico = crear_fondo_estatico()
+compositor = Compositor(ventana, fondo_estatico)
+cache_panel_general = CacheSuperficie()
+cache_panel_pid = CacheSuperficie()
+cache_menu = CacheSuperficie()
+cache_panel_perfil = CacheSuperficie()
+
+# Zonas que cambian cada frame (agua animada)
+zona_tanque_sup = rect_tanque_superior.copy()
+_x_izq_entrada = rect_cisterna.x - 100 - 6
+zona_cisterna = pygame.Rect(_x_izq_entrada, rect_cisterna.y - 18,
+                            rect_cisterna.right - _x_izq_entrada, rect_cisterna.h + 18)
+rect_losa_cis = pygame.Rect(zona_cisterna.x, y_suelo, zona_cisterna.w, 16).clip(zona_cisterna)
+rect_banner_alerta = pygame.Rect(0, 0, ancho_ventana, 38)
+rect_banner_pid_bajo = pygame.Rect(0, 40, ancho_ventana, 30)
+rect_banner_pid_alto = pygame.Rect(0, 10, ancho_ventana, 30)
+
+_estado_capas_previo = {}
+def componer_frame(caudal_bomba_lps, entrada_lps, texto_alerta, msg_pid):
+    """Marca las zonas sucias de este frame, las repinta y devuelve los rects a actualizar."""
+    compositor.marcar(zona_tanque_sup)
+    compositor.marcar(zona_cisterna)
+
+    rect_banner_pid = rect_banner_pid_bajo if texto_alerta else rect_banner_pid_alto
+    estado = {
+        "panel": dibujar_panel_general(caudal_bomba_lps, entrada_lps, texto_alerta),
+        "panel_pid": dibujar_panel_pid(),
+        "menu": menu_visible,
+        "perfil": dibujar_panel_perfil(),
+        "boton_panel": panel_visible,
+        "banner_alerta": bool(texto_alerta),
+        "banner_pid": rect_banner_pid.y if msg_pid else None,
+    }
+    previo = _estado_capas_previo
+    for clave, rect in (("panel", con_sombra(rect_panel)), ("panel_pid", con_sombra(rect_pid_panel)),
+                        ("menu", con_sombra(rect_menu)), ("perfil", con_sombra(rect_perfil_panel)),
+                        ("boton_panel", rect_boton_panel)):
+        # None = oculto; True = contenido nuevo
+        if estado[clave] is True or estado[clave] != previo.get(clave):
+            compositor.marcar(rect)
+    if texto_alerta or previo.get("banner_alerta"):
+        compositor.marcar(rect_banner_alerta)
+    for y in {estado["banner_pid"], previo.get("banner_pid")} - {None}:
+        compositor.marcar(pygame.Rect(0, y, ancho_ventana, 30))
+    _estado_capas_previo.update(estado)
+    _estado_capas_previo["panel"] = None if estado["panel"] is None else False
+    _estado_capas_previo["panel_pid"] = None if estado["panel_pid"] is None else False
+    _estado_capas_previo["perfil"] = None if estado["perfil"] is None else False
+
+    capas = [
+        (zona_tanque_sup, lambda: dibujar_tanque_superior(nivel_tanque_sup_cm, tiempo_total)),
+        (zona_cisterna, lambda: dibujar_cisterna(nivel_cisterna_cm, altura_boca_manguera_cm, tiempo_total, entrada_on)),
+        (rect_boton_panel, lambda: dibujar_boton_panel(panel_visible)),
+    ]
+    if panel_visible:
+        capas.append((con_sombra(rect_panel), lambda: ventana.blit(cache_panel_general.surf, rect_panel.topleft)))
+    if pid_panel_visible:
+        capas.append((con_sombra(rect_pid_panel), lambda: ventana.blit(cache_panel_pid.surf, rect_pid_panel.topleft)))
+    if menu_visible:
+        capas.append((con_sombra(rect_menu), dibujar_menu))
+    if perfil_visible:
+        capas.append((con_sombra(rect_perfil_panel), lambda: ventana.blit(cache_panel_perfil.surf, rect_perfil_panel.topleft)))
+    if texto_alerta:
+        capas.append((rect_banner_alerta, lambda: dibujar_banner_alerta(texto_alerta, parpadeo_t)))
+    if msg_pid:
+        capas.append((rect_banner_pid, lambda: dibujar_banner_pid(msg_pid, parpadeo_t, offset_y=rect_banner_pid.y)))
+    return compositor.componer(capas)
+
+# ====== Física de paso fijo y avance rápido ======
+# Cada paso simula PASO_FISICA_S segundos, sin importar los fps: el resultado
+# depende solo de la secuencia de pasos. t_sim es el reloj de la simulación
+# (epoch): avanza paso/factor por paso, así que a velocidad normal sigue al
+# reloj de pared y en avance rápido se adelanta. Métricas, series y la hora
+# del reporte diario usan t_sim.
+t_sim = time.time()
+pasos_fisica = 0
+acumulador_fisica = 0.0
+avance_rapido = AVANCE_RAPIDO
+caudal_bomba_lps = 0
+entrada_lps = 0
+texto_alerta = ""
+PASOS_POR_MUESTRA_FF = max(1, int(factor_tiempo_simulacion / PASO_FISICA_S))  # 1 s de t_sim
+PRESUPUESTO_FF_S = 0.03   # tiempo de CPU por frame en avance rápido
+
+def limitar_controles():
+    global altura_boca_manguera_cm, velocidad_bomba
+    li = distancia_suelo_segura_cm
+    ls = max(li, nivel_cisterna_cm - distancia_superficie_segura_cm)
+    altura_boca_manguera_cm = limitar(altura_boca_manguera_cm, li, ls)
+    velocidad_bomba = limitar(velocidad_bomba, 0, 1)
+
+def texto_alerta_de(sin_agua_cis, sin_agua_sup, boca_sumergida, bomba):
+    if sin_agua_cis:
+        return "CRÍTICO: Cisterna sin agua"
+    if sin_agua_sup:
+        return "Alerta: Tanque superior sin agua"
+    if (not boca_sumergida) and bomba:
+        return "PELIGRO: succión de aire"
+    return ""
+
+def registrar_muestra(h, pasos, bomba_on_paso, alerta_activa, disparo_seco):
+    """Agregador y series con el estado tras h segundos simulados ('pasos' pasos fijos)."""
+    agregador.muestra(
+        t_sim, h, h / factor_tiempo_simulacion, nivel_cisterna_cm, nivel_tanque_sup_cm,
+        caudal_bomba_lps, entrada_lps, consumo_tanque_sup_lps, bomba_on_paso,
+        pid_enabled, auto_llenado_activo, alerta_activa, disparo_seco, pasos=pasos)
+    if registrador is not None:
+        registrador.registrar(
+            t_sim, nivel_cisterna_cm, nivel_tanque_sup_cm, caudal_bomba_lps, entrada_lps,
+            velocidad_bomba, pid.u if pid_enabled else 0, altura_boca_manguera_cm,
+            (reg.ESTADO_BOMBA if bomba_on else 0) | (reg.ESTADO_ENTRADA if entrada_on else 0)
+            | (reg.ESTADO_PID if pid_enabled else 0) | (reg.ESTADO_AUTO if auto_llenado_activo else 0)
+            | (reg.ESTADO_ALERTA if alerta_activa else 0))
+
+def paso_fisica(h):
+    """Un paso de h segundos simulados: PID, caudales, niveles y protección en seco. Devuelve el texto de alerta."""
+    global nivel_cisterna_cm, nivel_tanque_sup_cm, velocidad_bomba, bomba_on, entrada_on
+    global auto_llenado_activo, entrada_forzada_por_pid, caudal_bomba_lps, entrada_lps, t_sim, pasos_fisica
+    limitar_controles()
+
+    entrada_lps = caudal_entrada_lps_activo if entrada_on else 0
+    boca_sumergida  = nivel_cisterna_cm > (altura_boca_manguera_cm + 2)
+    factor_sumergida= 1 if boca_sumergida else 0.05
+    elevacion_base_tanque_cm = 250
+    altura_entrega_cm = elevacion_base_tanque_cm + nivel_tanque_sup_cm - altura_boca_manguera_cm
+    if altura_entrega_cm < 0: altura_entrega_cm = 0
+    factor_presion = 1 - (altura_entrega_cm/400)
+    factor_presion = limitar(factor_presion, 0.3, 1)
+
+    sin_agua_cis = (nivel_cisterna_cm <= umbral_sin_agua_cm)
+    sin_agua_sup = (nivel_tanque_sup_cm <= umbral_sin_agua_cm)
+
+    if pid_enabled:
+        if sin_agua_cis and not auto_llenado_activo:
+            auto_llenado_activo = True
+            entrada_forzada_por_pid = True
+        if auto_llenado_activo:
+            entrada_on = True
+            velocidad_bomba = 0
+            if nivel_cisterna_cm >= umbral_auto_off:
+                auto_llenado_activo = False
+                if entrada_forzada_por_pid:
+                    entrada_on = False
+                    entrada_forzada_por_pid = False
+                if allow_pid_auto_start and (nivel_cisterna_cm > altura_boca_manguera_cm + 2):
+                    bomba_on = True
+        else:
+            if not bomba_on:
+                if allow_pid_auto_start and (nivel_cisterna_cm > altura_boca_manguera_cm + 2):
+                    bomba_on = True
+            if bomba_on:
+                u_pid = pid.step(pid_target_cm, nivel_tanque_sup_cm, h)
+                velocidad_bomba = limitar(u_pid, 0, 1)
+
+    caudal_bomba_lps = (velocidad_bomba if bomba_on else 0) * caudal_bomba_max_lps * factor_sumergida * factor_presion
+
+    delta_vol_cis_cm3 = (entrada_lps - caudal_bomba_lps) * 1000 * h
+    nivel_cisterna_cm = limitar(nivel_cisterna_cm + delta_vol_cis_cm3/area_cisterna_cm2, 0, alto_cisterna_cm)
+
+    delta_vol_sup_cm3 = (caudal_bomba_lps - consumo_tanque_sup_lps) * 1000 * h
+    nivel_tanque_sup_cm = limitar(nivel_tanque_sup_cm + delta_vol_sup_cm3/area_tanque_sup_cm2, 0, alto_tanque_sup_cm)
+
+    bomba_on_paso = bomba_on   # estado con que bombeó este paso (antes de la protección)
+    texto = texto_alerta_de(sin_agua_cis, sin_agua_sup, boca_sumergida, bomba_on)
+
+    disparo_seco = False
+    if (not boca_sumergida) and bomba_on and proteccion_seco_on:
+        bomba_on = False
+        disparo_seco = True
+
+    t_sim += h / factor_tiempo_simulacion
+    pasos_fisica += 1
+    registrar_muestra(h, 1, bomba_on_paso, texto != "", disparo_seco)
+    return texto
+
+def firma_eventos():
+    """Estado discreto de la planta: el avance rápido se detiene cuando cambia."""
+    c, s, b = nivel_cisterna_cm, nivel_tanque_sup_cm, altura_boca_manguera_cm
+    return (bomba_on, entrada_on, pid_enabled, auto_llenado_activo,
+            c <= umbral_sin_agua_cm, s <= umbral_sin_agua_cm, c > b + 2,
+            c >= umbral_auto_on, c >= umbral_auto_off,
+            c <= 0, c >= alto_cisterna_cm, s <= 0, s >= alto_tanque_sup_cm)
+
+def segundos_hasta_reporte():
+    """Segundos de t_sim hasta que toque el reporte diario (0 si está pendiente ahora)."""
+    if not 0 <= HORA_REPORTE_DIARIO <= 23:
+        return math.inf
+    ahora = datetime.fromtimestamp(t_sim)
+    objetivo = ahora.replace(hour=HORA_REPORTE_DIARIO, minute=0, second=0, microsecond=0)
+    if ahora.hour == HORA_REPORTE_DIARIO and _fecha_ultimo_reporte != ahora.date():
+        return 0
+    if objetivo <= ahora:
+        objetivo += timedelta(days=1)
+    return objetivo.timestamp() - t_sim
+
+def _pasos_hasta_cruce(x, d, umbrales):
+    k = math.inf
+    for u in umbrales:
+        if d > 0 and x < u:
+            k = min(k, math.ceil((u - x) / d))
+        elif d < 0 and x > u:
+            k = min(k, math.ceil((x - u) / -d))
+    return k
+
+def puede_saltar():
+    """
+    Sin PID y sin caudal de bomba los niveles cambian a ritmo constante. Con la
+    bomba encendida y la boca fuera del agua no se salta: la protección en seco
+    la apaga en el próximo paso.
+    """
+    if pid_enabled:
+        return False
+    if not bomba_on:
+        return True
+    disparo_pendiente = proteccion_seco_on and not nivel_cisterna_cm > altura_boca_manguera_cm + 2
+    return velocidad_bomba == 0 and not disparo_pendiente
+
+def pasos_hasta_evento():
+    h = PASO_FISICA_S
+    q_entrada = caudal_entrada_lps_activo if entrada_on else 0
+    b = altura_boca_manguera_cm
+    k_cis = _pasos_hasta_cruce(nivel_cisterna_cm, q_entrada * 1000 * h / area_cisterna_cm2,
+                               (0, umbral_sin_agua_cm, b + 2, umbral_auto_on, umbral_auto_off, alto_cisterna_cm))
+    k_sup = _pasos_hasta_cruce(nivel_tanque_sup_cm, -consumo_tanque_sup_lps * 1000 * h / area_tanque_sup_cm2,
+                               (0, umbral_sin_agua_cm, alto_tanque_sup_cm))
+    k_rep = math.ceil(segundos_hasta_reporte() * factor_tiempo_simulacion / h)
+    return min(k_cis, k_sup, k_rep)
+
+def saltar_lineal(k, hasta):
+    """
+    k pasos de golpe (ver puede_saltar). Agregador y series reciben una muestra
+    tras el primer paso y luego una por segundo de t_sim; como el tramo es
+    lineal, mínimos y máximos quedan en los extremos igual que paso a paso.
+    Corta antes si el reloj (perf_counter) pasa 'hasta'. Devuelve los pasos hechos.
+    """
+    global nivel_cisterna_cm, nivel_tanque_sup_cm, caudal_bomba_lps, entrada_lps, t_sim, pasos_fisica
+    h = PASO_FISICA_S
+    caudal_bomba_lps = 0
+    entrada_lps = caudal_entrada_lps_activo if entrada_on else 0
+    d_cis = entrada_lps * 1000 * h / area_cisterna_cm2
+    d_sup = -consumo_tanque_sup_lps * 1000 * h / area_tanque_sup_cm2
+    alerta = texto_alerta_de(nivel_cisterna_cm <= umbral_sin_agua_cm, nivel_tanque_sup_cm <= umbral_sin_agua_cm,
+                             nivel_cisterna_cm > altura_boca_manguera_cm + 2, bomba_on) != ""
+    hechos = 0
+    n = 1
+    while k > 0 and time.perf_counter() <= hasta:
+        n = min(k, n)
+        nivel_cisterna_cm = limitar(nivel_cisterna_cm + d_cis * n, 0, alto_cisterna_cm)
+        nivel_tanque_sup_cm = limitar(nivel_tanque_sup_cm + d_sup * n, 0, alto_tanque_sup_cm)
+        t_sim += n * h / factor_tiempo_simulacion
+        pasos_fisica += n
+        registrar_muestra(n * h, n, bomba_on, alerta, False)
+        k -= n
+        hechos += n
+        n = PASOS_POR_MUESTRA_FF
+    return hechos
+
+def avanzar_hasta_evento(limite_pasos, hasta):
+    """
+    Avanza sin dibujar hasta que cambie firma_eventos(), toque el reporte diario,
+    se cumplan limite_pasos o el reloj (perf_counter) pase 'hasta'. Sin PID y con
+    la bomba sin caudal salta de una vez hasta justo antes del próximo cruce.
+    Devuelve (pasos, texto de alerta).
+    """
+    firma = firma_eventos()
+    hechos = 0
+    texto = ""
+    while hechos < limite_pasos:
+        if puede_saltar():
+            k = min(pasos_hasta_evento(), limite_pasos - hechos)
+            if k > 1:
+                hechos += saltar_lineal(k - 1, hasta)
+        texto = paso_fisica(PASO_FISICA_S) or texto
+        hechos += 1
+        if firma_eventos() != firma or segundos_hasta_reporte() == 0 or time.perf_counter() > hasta:
+            break
+    return hechos, texto
+
+ejecutando = True
+tiempo_total = 0
+while ejecutando:
+    dt = reloj.tick(FPS_OBJETIVO)/1000
+    perfilador.inicio_frame()
+    tiempo_total += dt
+    parpadeo_t += dt
+
+    for e in pygame.event.get():
+        if e.type == pygame.QUIT:
+            ejecutando = False
+
+        elif e.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED):
+            compositor.marcar_todo()   # la ventana se destapó: hay que volver a presentar todo
+
+        elif e.type == pygame.KEYDOWN:
+            if e.key == pygame.K_SPACE: bomba_on = not bomba_on
+            elif e.key == pygame.K_i:   entrada_on = not entrada_on
+            elif e.key == pygame.K_p:   proteccion_seco_on = not proteccion_seco_on
+            elif e.key == pygame.K_m:   alarma_mute = not alarma_mute
+            elif e.key in (pygame.K_PLUS, pygame.K_EQUALS):
+                alarma_vol = limitar(alarma_vol+0.1, 0, 1)
+                if 'sonido_beep' in locals() and sonido_beep: sonido_beep.set_volume(alarma_vol)
+            elif e.key == pygame.K_MINUS:
+                alarma_vol = limitar(alarma_vol-0.1, 0, 1)
+                if 'sonido_beep' in locals() and sonido_beep: sonido_beep.set_volume(alarma_vol)
+            elif e.key == pygame.K_v: nivel_cisterna_cm = 0
+            elif e.key == pygame.K_t: nivel_tanque_sup_cm = 0
+            elif e.key == pygame.K_x: nivel_cisterna_cm = 0; nivel_tanque_sup_cm = 0
+            elif e.key == pygame.K_q: pid_enabled = not pid_enabled; pid.reset()
+            elif e.key == pygame.K_LEFTBRACKET:  pid_target_cm = limitar(pid_target_cm-5, 0, alto_tanque_sup_cm)
+            elif e.key == pygame.K_RIGHTBRACKET: pid_target_cm = limitar(pid_target_cm+5, 0, alto_tanque_sup_cm)
+            elif e.key == pygame.K_1: pid.set_gains(kp=pid.kp-0.01)
+            elif e.key == pygame.K_2: pid.set_gains(kp=pid.kp+0.01)
+            elif e.key == pygame.K_3: pid.set_gains(ki=pid.ki-0.005)
+            elif e.key == pygame.K_4: pid.set_gains(ki=pid.ki+0.005)
+            elif e.key == pygame.K_5: pid.set_gains(kd=pid.kd-0.01)
+            elif e.key == pygame.K_6: pid.set_gains(kd=pid.kd+0.01)
+            elif e.key == pygame.K_f: pid_panel_visible = not pid_panel_visible
+            elif e.key == pygame.K_a: allow_pid_auto_start = not allow_pid_auto_start
+            elif e.key == pygame.K_h: menu_visible = not menu_visible
+            elif e.key == pygame.K_o: perfil_visible = not perfil_visible
+            elif e.key == pygame.K_e: exportar_perfil()
+            elif e.key == pygame.K_n:
+                avance_rapido = not avance_rapido; acumulador_fisica = 0.0
+                pygame.display.set_caption("Simulación Bomba de Agua + PID" + (" [avance rápido]" if avance_rapido else ""))
+            elif e.key == pygame.K_r:
+                nivel_cisterna_cm, nivel_tanque_sup_cm = 140, 30
+                altura_boca_manguera_cm = 120
+                bomba_on = True; velocidad_bomba = 0.6; entrada_on = False
+                pid_enabled = False; pid_panel_visible = True; panel_visible = True
+                auto_llenado_activo = False; entrada_forzada_por_pid = False
+                allow_pid_auto_start = True
+                menu_visible = False
+                pid.reset()
+
+        elif e.type == pygame.MOUSEBUTTONDOWN and e.button == 1:
+            if rect_boton_panel.collidepoint(e.pos): panel_visible = not panel_visible
+            elif rect_btn_vac_cis.collidepoint(e.pos): nivel_cisterna_cm = 0
+            elif rect_btn_vac_sup.collidepoint(e.pos): nivel_tanque_sup_cm = 0
+            elif rect_btn_pid_panel.collidepoint(e.pos): pid_panel_visible = not pid_panel_visible
+            elif rect_boton_menu.collidepoint(e.pos): menu_visible = not menu_visible
+            elif menu_visible and rect_menu and rect_menu.collidepoint(e.pos):
+                if rect_menu_rep.collidepoint(e.pos):
+                    accion_enviar_reporte_ahora()
+                elif rect_menu_csv.collidepoint(e.pos):
+                    accion_enviar_csv_ahora()
+                elif rect_menu_png.collidepoint(e.pos):
+                    accion_enviar_png_ahora()
+                elif rect_menu_short.collidepoint(e.pos):
+                    accion_enviar_resumen_ahora()
+
+    teclas = pygame.key.get_pressed()
+    perfilador.marca("eventos")
+    if not pid_enabled:
+        if teclas[pygame.K_UP]:   velocidad_bomba += 0.7*dt
+        if teclas[pygame.K_DOWN]: velocidad_bomba -= 0.7*dt
+    if teclas[pygame.K_w]: altura_boca_manguera_cm += 45*dt
+    if teclas[pygame.K_s]: altura_boca_manguera_cm -= 45*dt
+
+    limitar_controles()
+
+    pasos_frame = 0
+    texto_pasos = ""
+    if reproductor is not None:
+        m = reproductor.muestra(tiempo_total)
+        if m is None:
+            # fin de la grabación: queda en pausa en la última muestra; seguir en vivo
+            # mandaría alertas y reportes reales desde una ventana de reproducción
+            if not fin_reproduccion:
+                fin_reproduccion = True
+                pygame.display.set_caption(f"Simulación Bomba de Agua + PID [fin de la reproducción {DIA_REPRODUCCION}]")
+        else:
+            nivel_cisterna_cm = m["nivel_cis_cm"]
+            nivel_tanque_sup_cm = m["nivel_sup_cm"]
+            caudal_bomba_lps = m["caudal_bomba_lps"]
+            entrada_lps = m["caudal_entrada_lps"]
+            velocidad_bomba = m["velocidad_bomba"]
+            altura_boca_manguera_cm = m["boca_cm"]
+            bomba_on = bool(m["estado"] & reg.ESTADO_BOMBA)
+            entrada_on = bool(m["estado"] & reg.ESTADO_ENTRADA)
+            texto_alerta = texto_alerta_de(nivel_cisterna_cm <= umbral_sin_agua_cm,
+                                           nivel_tanque_sup_cm <= umbral_sin_agua_cm,
+                                           nivel_cisterna_cm > altura_boca_manguera_cm + 2, bomba_on)
+            t_sim += dt
+            registrar_muestra(dt * factor_tiempo_simulacion, 1, bomba_on, texto_alerta != "", False)
+    if reproductor is None:
+        restantes = math.inf
+        if MAX_HORAS_SIM:
+            restantes = max(0, math.ceil(MAX_HORAS_SIM * 3600 / PASO_FISICA_S) - pasos_fisica)
+        if avance_rapido:
+            pasos_frame, texto_pasos = avanzar_hasta_evento(restantes, time.perf_counter() + PRESUPUESTO_FF_S)
+        elif PASOS_FIJOS:
+            pasos_frame = min(PASOS_FIJOS, restantes)
+            for _ in range(pasos_frame):
+                texto_pasos = paso_fisica(PASO_FISICA_S) or texto_pasos
+        else:
+            acumulador_fisica += dt * factor_tiempo_simulacion
+            pasos_frame = min(int(acumulador_fisica / PASO_FISICA_S), MAX_PASOS_FRAME, restantes)
+            for _ in range(pasos_frame):
+                texto_pasos = paso_fisica(PASO_FISICA_S) or texto_pasos
+            if pasos_frame == MAX_PASOS_FRAME:
+                acumulador_fisica = 0.0   # frame muy lento: se descarta el atraso en vez de acumularlo
+                # ...pero no el tiempo: si t_sim se quedara atrás, el reporte diario y las
+                # series se correrían respecto del reloj de pared en cada atasco
+                t_sim = max(t_sim, time.time())
+            else:
+                acumulador_fisica -= pasos_frame * PASO_FISICA_S
+        if pasos_frame:
+            texto_alerta = texto_pasos
+        if MAX_HORAS_SIM and pasos_frame >= restantes:
+            ejecutando = False
+
+    sin_agua_sup = (nivel_tanque_sup_cm <= umbral_sin_agua_cm)
+
+    quiere_alarma = (texto_alerta != "") and (not alarma_mute)
+    if sonido_beep and canal_alarma:
+        if quiere_alarma:
+            if not canal_alarma.get_busy():
+                canal_alarma.play(sonido_beep, loops=-1)
+        else:
+            if canal_alarma.get_busy():
+                canal_alarma.stop()
+
+    msg_pid = ""
+    if pid_enabled:
+        if auto_llenado_activo:
+            msg_pid = "PID corrigiendo: auto-llenando cisterna"
+        elif not bomba_on:
+            msg_pid = "PID en espera: bomba apagada"
+        elif sin_agua_sup:
+            msg_pid = "PID corrigiendo: recuperando tanque superior"
+    perfilador.marca("fisica")
+
+    # reproducir un incidente no debe volver a alertar, ni avanzar días simulados
+    if reproductor is None and not avance_rapido:
+        notificar_alerta(texto_alerta, msg_pid)
+    perfilador.marca("alertas")
+
+    rects_sucios = componer_frame(caudal_bomba_lps, entrada_lps, texto_alerta, msg_pid)
+    perfilador.marca("dibujo")
+
+    ahora = datetime.fromtimestamp(t_sim)
+    hoy = ahora.date()
+    # con un día reproducido el agregador tiene datos grabados: no es un reporte del día
+    if reproductor is None and ahora.hour == HORA_REPORTE_DIARIO and (_fecha_ultimo_reporte != hoy):
+        # en avance rápido el día es simulado: se cierra sin mandar ni escribir el reporte
+        if not avance_rapido:
+            texto_reporte = crear_texto_reporte_diario(hoy)
+            tg.encolar_mensaje(texto_reporte)
+            if CREAR_ARCHIVOS_REPORTE:
+                try:
+                    ruta_csv = escribir_csv_diario(hoy)
+                    tg.encolar_documento(ruta_csv, caption="📄 CSV del reporte diario")
+                except Exception:
+                    pass
+            if ENVIAR_CAPTURAS:
+                capturador.capturar(ventana, caption="🖼 Captura del estado al cierre", forzar=True)
+        _fecha_ultimo_reporte = hoy
+        reiniciar_metricas_diarias()
+    perfilador.marca("reporte")
+
+    pygame.display.update(rects_sucios)
+    perfilador.marca("display")
+    perfilador.fin_frame()
+    if MAX_FRAMES and perfilador.frames >= MAX_FRAMES:
+        ejecutando = False
+
+try:
+    if canal_alarma and canal_alarma.get_busy(): canal_alarma.stop()
+except: pass
+if RUTA_PERFIL:
+    exportar_perfil(RUTA_PERFIL)
+capturador.detener()
+pygame.quit()
+if registrador is not None:
+    registrador.cerrar()
+tg.detener_despachador(timeout=5)   # da unos segundos para vaciar la cola de envíos
+try:
+    if os.path.exists(ruta_beep): os.remove(ruta_beep)
+except: pass
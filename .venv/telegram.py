@@ -0,0 +1,286 @@
+import os, time, queue, threading, requests
+from typing import Optional, Dict, Any, Callable, Union
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TOKEN   = os.getenv("TELEGRAM_BOT_TOKEN", "")
+CHAT_ID = os.getenv("TELEGRAM_CHAT_ID", "")
+ENABLED = os.getenv("TELEGRAM_ENABLED", "true").lower() == "true"
+
+# TELEGRAM_API_URL permite apuntar a un servidor local de prueba
+API_URL  = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org").rstrip("/")
+API_BASE = f"{API_URL}/bot{TOKEN}"
+
+LIMITE_TEXTO = 4096   # máximo de caracteres por mensaje en la API
+
+# Sesión compartida: reutiliza conexiones TLS en vez de abrir una por envío
+_sesion = requests.Session()
+_sesion.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=4))
+_sesion.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=4))
+
+def _habilitado() -> bool:
+    return ENABLED and bool(TOKEN) and bool(CHAT_ID)
+
+class Debouncer:
+    """Evita spam: solo envía si cambió el payload o pasó el intervalo."""
+    def __init__(self, min_interval_sec: float = 20):
+        self.min_interval = min_interval_sec
+        self._last_payload = None
+        self._last_time = 0
+    def should_send(self, payload: str) -> bool:
+        ahora = time.time()
+        cambio = (payload != self._last_payload)
+        suficiente = (ahora - self._last_time) >= self.min_interval
+        if cambio or suficiente:
+            self._last_payload = payload
+            self._last_time = ahora
+            return True
+        return False
+
+def delete_webhook() -> bool:
+    if not TOKEN: return False
+    try:
+        _sesion.get(f"{API_BASE}/deleteWebhook", timeout=10)
+        return True
+    except Exception:
+        return False
+
+def _post_mensaje(text: str, disable_notification: bool = False,
+                  reply_markup: Optional[Dict[str, Any]] = None) -> requests.Response:
+    payload: Dict[str, Any] = {
+        "chat_id": CHAT_ID,
+        "text": text,
+        "parse_mode": "HTML",
+        "disable_notification": disable_notification
+    }
+    if reply_markup is not None:
+        payload["reply_markup"] = reply_markup
+    return _sesion.post(f"{API_BASE}/sendMessage", json=payload, timeout=12)
+
+def _post_archivo(metodo: str, campo: str, archivo: Union[str, bytes], caption: Optional[str],
+                  disable_notification: bool, timeout: float, nombre: str = "archivo") -> requests.Response:
+    """archivo: ruta en disco o contenido en memoria (bytes)."""
+    data = {
+        "chat_id": CHAT_ID,
+        "caption": caption or "",
+        "parse_mode": "HTML",
+        "disable_notification": disable_notification
+    }
+    if isinstance(archivo, (bytes, bytearray)):
+        return _sesion.post(f"{API_BASE}/{metodo}", data=data, files={campo: (nombre, archivo)}, timeout=timeout)
+    with open(archivo, "rb") as f:
+        return _sesion.post(f"{API_BASE}/{metodo}", data=data, files={campo: f}, timeout=timeout)
+
+def send_message(text: str, disable_notification: bool = False, reply_markup: Optional[Dict[str, Any]] = None) -> bool:
+    if not _habilitado():
+        return False
+    try:
+        return _post_mensaje(text, disable_notification, reply_markup).ok
+    except Exception:
+        return False
+
+def send_photo(image_path: str, caption: Optional[str] = None, disable_notification: bool = False) -> bool:
+    if not _habilitado():
+        return False
+    try:
+        return _post_archivo("sendPhoto", "photo", image_path, caption, disable_notification, 20).ok
+    except Exception:
+        return False
+
+def send_document(file_path: str, caption: Optional[str] = None, disable_notification: bool = False) -> bool:
+    if not _habilitado():
+        return False
+    try:
+        return _post_archivo("sendDocument", "document", file_path, caption, disable_notification, 25).ok
+    except Exception:
+        return False
+
+
+# ================= Envío en segundo plano =================
+_FIN = object()   # señal de cierre para el hilo trabajador
+
+class Despachador:
+    """
+    Cola acotada + hilo trabajador. encolar() no bloquea: si la cola está
+    llena el envío se descarta y se cuenta en las métricas.
+    Mensajes de texto consecutivos se agrupan en uno solo (hasta LIMITE_TEXTO).
+    """
+    def __init__(self, max_cola: int = 200, max_reintentos: int = 4,
+                 ventana_agrupado_sec: float = 0.5, espera_max_sec: float = 60):
+        self._cola: "queue.Queue" = queue.Queue(maxsize=max_cola)
+        self.max_reintentos = max_reintentos
+        self.ventana_agrupado = ventana_agrupado_sec
+        self.espera_max = espera_max_sec
+        self._pendiente = None
+        self._lock = threading.Lock()
+        self._metricas = {
+            "encolados": 0, "enviados": 0, "fallidos": 0, "descartados": 0,
+            "agrupados": 0, "reintentos": 0, "limitados_429": 0, "seg_envio": 0.0,
+        }
+        self._hilo = threading.Thread(target=self._trabajar, name="telegram-despachador", daemon=True)
+        self._hilo.start()
+
+    # ---- lado del hilo principal ----
+    def encolar(self, tipo: str, al_terminar: Optional[Callable[[bool], None]] = None, **datos) -> bool:
+        try:
+            self._cola.put_nowait((tipo, datos, al_terminar))
+        except queue.Full:
+            self._contar("descartados")
+            return False
+        self._contar("encolados")
+        return True
+
+    def metricas(self) -> Dict[str, Any]:
+        with self._lock:
+            m = dict(self._metricas)
+        m["en_cola"] = self._cola.qsize()
+        return m
+
+    def detener(self, timeout: float = 5) -> None:
+        """Espera a que se vacíe la cola (como mucho timeout segundos)."""
+        try:
+            self._cola.put(_FIN, timeout=timeout)
+        except queue.Full:
+            return
+        self._hilo.join(timeout)
+
+    # ---- lado del trabajador ----
+    def _contar(self, clave: str, n: float = 1) -> None:
+        with self._lock:
+            self._metricas[clave] += n
+
+    def _siguiente(self, timeout: Optional[float] = None):
+        if self._pendiente is not None:
+            item, self._pendiente = self._pendiente, None
+            return item
+        return self._cola.get(timeout=timeout)
+
+    def _agrupar(self, datos: Dict[str, Any], callbacks: list) -> None:
+        """Junta en datos['text'] los mensajes que lleguen dentro de la ventana."""
+        limite = time.monotonic() + self.ventana_agrupado
+        while True:
+            resto = limite - time.monotonic()
+            if resto <= 0:
+                return
+            try:
+                item = self._siguiente(timeout=resto)
+            except queue.Empty:
+                return
+            if item is _FIN:
+                self._pendiente = item
+                return
+            tipo, otros, cb = item
+            compatible = (tipo == "mensaje"
+                          and otros.get("reply_markup") is None
+                          and otros.get("disable_notification", False) == datos.get("disable_notification", False))
+            texto = datos["text"] + "\n\n" + otros.get("text", "")
+            if not compatible or len(texto) > LIMITE_TEXTO:
+                self._pendiente = item
+                return
+            datos["text"] = texto
+            callbacks.append(cb)
+            self._contar("agrupados")
+
+    def _ejecutar(self, tipo: str, datos: Dict[str, Any]) -> requests.Response:
+        if tipo == "mensaje":
+            return _post_mensaje(**datos)
+        if tipo == "foto":
+            return _post_archivo("sendPhoto", "photo", datos["ruta"], datos.get("caption"),
+                                 datos.get("disable_notification", False), 20, datos.get("nombre", "captura.jpg"))
+        return _post_archivo("sendDocument", "document", datos["ruta"], datos.get("caption"),
+                             datos.get("disable_notification", False), 25)
+
+    def _enviar_con_reintentos(self, tipo: str, datos: Dict[str, Any]) -> bool:
+        espera = 1.0
+        for intento in range(self.max_reintentos + 1):
+            if intento:
+                self._contar("reintentos")
+            try:
+                t0 = time.perf_counter()
+                r = self._ejecutar(tipo, datos)
+                self._contar("seg_envio", time.perf_counter() - t0)
+            except (requests.ConnectionError, requests.Timeout):
+                r = None
+            except Exception:
+                return False
+            if r is not None:
+                if r.ok:
+                    return True
+                if r.status_code == 429:
+                    self._contar("limitados_429")
+                    espera = _retry_after(r, espera)
+                elif r.status_code < 500:
+                    return False   # error del cliente: reintentar no sirve
+            if intento < self.max_reintentos:
+                time.sleep(min(espera, self.espera_max))
+                espera = min(espera * 2, self.espera_max)
+        return False
+
+    def _trabajar(self) -> None:
+        while True:
+            item = self._siguiente()
+            if item is _FIN:
+                return
+            tipo, datos, cb = item
+            callbacks = [cb]
+            if tipo == "mensaje" and datos.get("reply_markup") is None:
+                self._agrupar(datos, callbacks)
+            ok = _habilitado() and self._enviar_con_reintentos(tipo, datos)
+            self._contar("enviados" if ok else "fallidos")
+            for c in callbacks:
+                if c is not None:
+                    try:
+                        c(ok)
+                    except Exception:
+                        pass
+
+def _retry_after(r: requests.Response, defecto: float) -> float:
+    try:
+        return float(r.json()["parameters"]["retry_after"])
+    except Exception:
+        pass
+    try:
+        return float(r.headers.get("Retry-After", defecto))
+    except (TypeError, ValueError):
+        return defecto
+
+
+_despachador: Optional[Despachador] = None
+_despachador_lock = threading.Lock()
+
+def despachador() -> Despachador:
+    global _despachador
+    if _despachador is None:
+        with _despachador_lock:
+            if _despachador is None:
+                _despachador = Despachador()
+    return _despachador
+
+def encolar_mensaje(text: str, disable_notification: bool = False,
+                    reply_markup: Optional[Dict[str, Any]] = None,
+                    al_terminar: Optional[Callable[[bool], None]] = None) -> bool:
+    if not _habilitado():
+        return False
+    return despachador().encolar("mensaje", al_terminar, text=text,
+                                 disable_notification=disable_notification, reply_markup=reply_markup)
+
+def encolar_foto(image: Union[str, bytes], caption: Optional[str] = None, disable_notification: bool = False,
+                 al_terminar: Optional[Callable[[bool], None]] = None, nombre: str = "captura.jpg") -> bool:
+    """image: ruta del archivo o la imagen ya codificada en memoria."""
+    if not _habilitado():
+        return False
+    return despachador().encolar("foto", al_terminar, ruta=image, caption=caption,
+                                 disable_notification=disable_notification, nombre=nombre)
+
+def encolar_documento(file_path: str, caption: Optional[str] = None, disable_notification: bool = False,
+                      al_terminar: Optional[Callable[[bool], None]] = None) -> bool:
+    if not _habilitado():
+        return False
+    return despachador().encolar("documento", al_terminar, ruta=file_path, caption=caption,
+                                 disable_notification=disable_notification)
+
+def detener_despachador(timeout: float = 5) -> None:
+    if _despachador is not None:
+        _despachador.detener(timeout)
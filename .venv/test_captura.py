@@ -0,0 +1,50 @@
+"""
+Pruebas de la detección de capturas repetidas del Capturador.
+"""
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ["TELEGRAM_ENABLED"] = "false"
+
+import pygame
+import pytest
+
+from captura import Capturador
+
+
+@pytest.fixture
+def cap():
+    c = Capturador(max_por_minuto=2, max_cola=8)
+    yield c
+    c.detener()
+
+
+def _pantalla(fase: int, nivel: int) -> pygame.Surface:
+    """Tanque con el nivel dado y una onda de 2 px que se mueve con 'fase'."""
+    s = pygame.Surface((400, 300))
+    s.fill((235, 235, 235))
+    pygame.draw.rect(s, (40, 110, 200), (100, 300 - nivel, 200, nivel))
+    for x in range(100, 300, 8):
+        pygame.draw.line(s, (200, 230, 255), (x + fase % 8, 300 - nivel), (x + fase % 8 + 3, 300 - nivel), 2)
+    return s
+
+
+def test_misma_clave_no_consume_el_tope(cap):
+    assert cap.capturar(_pantalla(0, 100), clave=(100, "alerta"))
+    for fase in range(1, 5):
+        assert not cap.capturar(_pantalla(fase, 100), clave=(100, "alerta"))
+    assert cap.metricas["repetidas"] == 4
+    # el cupo sigue disponible para un estado distinto
+    assert cap.capturar(_pantalla(5, 150), clave=(150, "alerta"))
+    assert cap.metricas["limitadas"] == 0
+
+
+def test_sin_clave_ignora_la_animacion(cap):
+    assert cap.capturar(_pantalla(0, 100))
+    assert not cap.capturar(_pantalla(3, 100))
+    assert cap.capturar(_pantalla(3, 200))
+
+
+def test_forzar_no_se_descarta(cap):
+    assert cap.capturar(_pantalla(0, 100), clave=1)
+    assert cap.capturar(_pantalla(0, 100), clave=1, forzar=True)
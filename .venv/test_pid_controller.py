@@ -0,0 +1,43 @@
+"""PIDBank debe dar bit a bit lo mismo que N objetos PID independientes."""
+import numpy as np
+
+from pid_controller import PID, PIDGains, PIDBank
+
+
+def test_bank_igual_a_pid_escalar():
+    rng = np.random.default_rng(1234)
+    n, pasos = 50, 2000
+    kp, ki, kd = rng.uniform(0, 0.5, n), rng.uniform(0, 0.1, n), rng.uniform(0, 0.3, n)
+    umin, umax = rng.uniform(-0.5, 0, n), rng.uniform(0.5, 1.5, n)
+    tau, bias = rng.uniform(0, 0.2, n), rng.uniform(-0.1, 0.1, n)
+
+    escalares = [PID(PIDGains(kp[i], ki[i], kd[i]), umin=umin[i], umax=umax[i], tau=tau[i], bias=bias[i])
+                 for i in range(n)]
+    banco = PIDBank(n, kp=kp, ki=ki, kd=kd, umin=umin, umax=umax, tau=tau, bias=bias)
+
+    for k in range(pasos):
+        sp = rng.uniform(0, 200, n)
+        pv = rng.uniform(0, 200, n)
+        dt = np.where(rng.random(n) < 0.1, 0.0, rng.uniform(0.01, 2, n))   # dt = 0 no avanza
+        mascara = rng.random(n) < 0.8
+        if k % 500 == 499:   # reinicio parcial a mitad de corrida
+            reinicio = rng.random(n) < 0.3
+            banco.reset(reinicio)
+            for i in np.flatnonzero(reinicio):
+                escalares[i].reset()
+
+        u = banco.step(sp, pv, dt, mascara=mascara)
+        esperado = np.array([c.step(sp[i], pv[i], dt[i]) if mascara[i] else c.u
+                             for i, c in enumerate(escalares)])
+        np.testing.assert_array_equal(u, esperado)
+        np.testing.assert_array_equal(banco._i, [c._i for c in escalares])
+        np.testing.assert_array_equal(banco._d_filt, [c._d_filt for c in escalares])
+
+
+def test_step_devuelve_copia():
+    banco = PIDBank(3)
+    u1 = banco.step(np.full(3, 100.0), np.zeros(3), 0.5)
+    guardado = u1.copy()
+    banco.step(np.zeros(3), np.full(3, 100.0), 0.5)
+    np.testing.assert_array_equal(u1, guardado)
+    assert banco.step(np.zeros(3), np.zeros(3), 0.0) is not banco.u
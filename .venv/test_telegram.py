@@ -0,0 +1,110 @@
+"""
+Pruebas del Despachador contra un servidor HTTP local (TELEGRAM_API_URL).
+
+El servidor responde con la lista de respuestas que prepara cada prueba y
+guarda cada pedido recibido (ruta y cuerpo).
+"""
+import importlib, json, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class _Stub(BaseHTTPRequestHandler):
+    respuestas = []    # (código, dict) a devolver en orden; luego 200 ok
+    pedidos = []       # (monotonic, ruta, cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        cuerpo = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.pedidos.append((time.monotonic(), self.path, cuerpo))
+        codigo, datos = self.respuestas.pop(0) if self.respuestas else (200, {"ok": True})
+        salida = json.dumps(datos).encode()
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(salida)))
+        self.end_headers()
+        self.wfile.write(salida)
+
+
+@pytest.fixture(scope="module")
+def servidor():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Stub)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_port}"
+    srv.shutdown()
+
+
+@pytest.fixture
+def tg(servidor, monkeypatch):
+    monkeypatch.setenv("TELEGRAM_API_URL", servidor)
+    monkeypatch.setenv("TELEGRAM_BOT_TOKEN", "TOKEN")
+    monkeypatch.setenv("TELEGRAM_CHAT_ID", "42")
+    monkeypatch.setenv("TELEGRAM_ENABLED", "true")
+    import telegram
+    modulo = importlib.reload(telegram)
+    _Stub.respuestas = []
+    _Stub.pedidos = []
+    yield modulo
+    modulo.detener_despachador(timeout=5)
+
+
+def test_agrupa_mensajes_consecutivos(tg):
+    d = tg.Despachador(ventana_agrupado_sec=0.3)
+    res = []
+    for i in range(3):
+        d.encolar("mensaje", res.append, text=f"msg {i}")
+    d.detener(timeout=5)
+
+    assert len(_Stub.pedidos) == 1
+    _, ruta, cuerpo = _Stub.pedidos[0]
+    assert ruta == "/botTOKEN/sendMessage"
+    assert json.loads(cuerpo)["text"] == "msg 0\n\nmsg 1\n\nmsg 2"
+    assert res == [True, True, True]
+    m = d.metricas()
+    assert (m["enviados"], m["agrupados"]) == (1, 2)
+
+
+def test_429_respeta_retry_after(tg):
+    _Stub.respuestas = [(429, {"ok": False, "parameters": {"retry_after": 1}})]
+    d = tg.Despachador(ventana_agrupado_sec=0)
+    res = []
+    d.encolar("mensaje", res.append, text="hola")
+    d.detener(timeout=10)
+
+    assert len(_Stub.pedidos) == 2
+    assert _Stub.pedidos[1][0] - _Stub.pedidos[0][0] >= 0.9
+    assert res == [True]
+    m = d.metricas()
+    assert (m["limitados_429"], m["reintentos"], m["enviados"]) == (1, 1, 1)
+
+
+def test_4xx_no_se_reintenta(tg):
+    _Stub.respuestas = [(400, {"ok": False, "description": "Bad Request"})]
+    d = tg.Despachador(ventana_agrupado_sec=0)
+    res = []
+    d.encolar("mensaje", res.append, text="hola")
+    d.detener(timeout=5)
+
+    assert len(_Stub.pedidos) == 1
+    assert res == [False]
+    m = d.metricas()
+    assert (m["reintentos"], m["fallidos"]) == (0, 1)
+
+
+def test_foto_desde_memoria(tg):
+    imagen = b"\xff\xd8\xff\xe0JPEG-de-prueba"
+    d = tg.Despachador()
+    res = []
+    d.encolar("foto", res.append, ruta=imagen, caption="estado", nombre="captura.jpg")
+    d.detener(timeout=5)
+
+    assert len(_Stub.pedidos) == 1
+    _, ruta, cuerpo = _Stub.pedidos[0]
+    assert ruta == "/botTOKEN/sendPhoto"
+    assert imagen in cuerpo
+    assert b'filename="captura.jpg"' in cuerpo
+    assert b"estado" in cuerpo
+    assert res == [True]